@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+# Pre-aggregation for the chart types whose marks summarise many rows (histogram, heat map,
+# bars, pie, sunburst). Plotly then receives bins/groups instead of every raw row.
+
+
+def _is_binnable(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+# Values as float64 for np.histogram; datetimes become epoch nanoseconds
+def _as_float(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    return series.to_numpy(dtype=np.float64)
+
+
+def _from_float(values, like):
+    if pd.api.types.is_datetime64_any_dtype(like):
+        return pd.to_datetime(values.astype(np.int64))
+    return values
+
+
+# Histogram of one column: (frame with bin start/end/center and count, bin width)
+def histogram_bins(series, nbins):
+    series = series.dropna()
+    if not _is_binnable(series):
+        counts = series.value_counts(sort=False)
+        return pd.DataFrame({"bin": counts.index, "count": counts.to_numpy()}), None
+    values = _as_float(series)
+    counts, edges = np.histogram(values, bins=max(1, int(nbins)))
+    width = edges[1] - edges[0] if len(edges) > 1 else 1.0
+    centers = (edges[:-1] + edges[1:]) / 2
+    frame = pd.DataFrame({
+        "bin": _from_float(centers, series),
+        "start": _from_float(edges[:-1], series),
+        "end": _from_float(edges[1:], series),
+        "count": counts,
+    })
+    if pd.api.types.is_datetime64_any_dtype(series):
+        width = pd.to_timedelta(width, unit="ns").total_seconds() * 1000  # plotly date axes use ms
+    return frame, width
+
+
+# 2D counts of two columns: (x labels, y labels, z matrix with z[y][x])
+def heatmap_counts(x, y, nbins):
+    pair = pd.DataFrame({"x": x, "y": y}).dropna()
+    if _is_binnable(pair["x"]) and _is_binnable(pair["y"]):
+        z, x_edges, y_edges = np.histogram2d(_as_float(pair["x"]), _as_float(pair["y"]), bins=max(1, int(nbins)))
+        x_centers = _from_float((x_edges[:-1] + x_edges[1:]) / 2, pair["x"])
+        y_centers = _from_float((y_edges[:-1] + y_edges[1:]) / 2, pair["y"])
+        return x_centers, y_centers, z.T
+    # At least one categorical axis: bin numeric sides, count categories as they are
+    keys = {}
+    for axis in ("x", "y"):
+        if _is_binnable(pair[axis]):
+            binned = pd.cut(_as_float(pair[axis]), bins=max(1, int(nbins)))
+            mids = np.asarray(_from_float(np.asarray(binned.categories.mid), pair[axis]))
+            keys[axis] = pd.Series(mids[binned.codes], index=pair.index)
+        else:
+            keys[axis] = pair[axis]
+    table = pd.crosstab(keys["y"], keys["x"])
+    return table.columns.to_numpy(), table.index.to_numpy(), table.to_numpy()
+
+
+# Sum of y per x (and per color group), which is what stacked/grouped bars display
+def bar_sums(df, x, y, color=None):
+    keys = [x] if not color or color == x else [x, color]
+    return df.groupby(keys, observed=True, sort=True)[y].sum().reset_index()
+
+
+# Frequency of each combination of the path columns, for pie and sunburst charts
+def value_counts(df, columns, name="count"):
+    counts = df.groupby(list(columns), observed=True, dropna=True).size()
+    return counts.rename(name).reset_index()
+
+
+AGGREGATIONS = ["sum", "mean", "median", "min", "max", "count"]
+
+
+# One row per group of `by`, numeric columns reduced with `how` ("count" gives the group sizes)
+def group_aggregate(df, by, how="sum"):
+    by = list(by)
+    if how == "count":
+        return df.groupby(by, observed=True, sort=True).size().rename("count").reset_index()
+    values = [c for c in df.columns if c not in by and pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    return df.groupby(by, observed=True, sort=True)[values].agg(how).reset_index()
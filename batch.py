@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from charts import CHART_TYPES, generate_plot
+from dispatcher import openai_dispatcher
+from downsampling import FULL_POINTS
+from ingest import read_path, read_url
+from profiler import profile_dataframe
+from recommendations import cached_recommendation, describe_dataset, recommendation_messages
+
+
+# Headless batch mode: profile, recommend and render many datasets without Streamlit.
+#
+#   python batch.py data/ --charts charts.json --out build/ --workers 8 --recommender stub
+#
+# Inputs are a directory (every .csv/.xlsx/.json in it) or a manifest: a JSON list of paths/URLs,
+# or of {"source": ..., "charts": [...]} objects that override the default chart specs.
+# A chart spec is {"chart_type": ..., "x": ..., "y": ..., "z": ..., "bins": ..., "size": ...};
+# omitted axes are picked from the dataset profile.
+
+DATA_EXTENSIONS = (".csv", ".xlsx", ".json", ".ndjson", ".jsonl")
+DEFAULT_CHARTS = [{"chart_type": "Histogram"}, {"chart_type": "Scatter Plot"}, {"chart_type": "Bar Chart"}]
+
+
+# Datasets (and optional per-dataset chart specs) from a directory or manifest file
+def collect_datasets(source):
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(DATA_EXTENSIONS))
+        return [{"source": os.path.join(source, n)} for n in names]
+    with open(source, encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    base = os.path.dirname(os.path.abspath(source))
+    datasets = []
+    for entry in manifest:
+        entry = {"source": entry} if isinstance(entry, str) else dict(entry)
+        if not entry["source"].startswith("http") and not os.path.isabs(entry["source"]):
+            entry["source"] = os.path.join(base, entry["source"])
+        datasets.append(entry)
+    return datasets
+
+
+def load_dataset(source):
+    if source.startswith("http"):
+        return read_url(source)
+    return read_path(source)
+
+
+# Fill in missing axes of a chart spec from the dataset profile
+def resolve_axes(spec, profile):
+    kinds = {column: info["kind"] for column, info in profile["columns"].items()}
+    columns = list(kinds)
+    numeric = [c for c in columns if kinds[c] == "numeric"]
+    categorical = [c for c in columns if kinds[c] == "categorical"]
+    by_name = {str(c).lower(): c for c in columns}
+
+    def first(*candidates):
+        for group in candidates:
+            for column in group:
+                if column is not None:
+                    return column
+        return columns[0] if columns else None
+
+    chart_type = spec["chart_type"]
+    if chart_type in ("Geospatial scatter map",):
+        x = by_name.get("lon") or by_name.get("longitude") or by_name.get("lng")
+        y = by_name.get("lat") or by_name.get("latitude")
+        defaults = (first([x], numeric), first([y], numeric[1:], numeric), None)
+    elif chart_type in ("Bar Chart", "Stacked Bar Chart", "Grouped Bar Chart", "Boxplot", "Violin plot"):
+        defaults = (first(categorical, columns), first(numeric), first(categorical[1:], categorical))
+    elif chart_type in ("Pie Chart", "Sun diagram", "Choropleth map"):
+        defaults = (first(categorical, columns), first(numeric), None)
+    else:
+        defaults = (first(numeric), first(numeric[1:], numeric), first(numeric[2:], numeric))
+    resolved = dict(spec)
+    for name, default in zip(("x", "y", "z"), defaults):
+        resolved.setdefault(name, default)
+    return resolved
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-").lower() or "dataset"
+
+
+# Output directory of one dataset: its file name with the extension, plus a short hash of the
+# full source so sales.csv, sales.json and two URLs ending in sales.csv don't share a directory
+def dataset_dir(source):
+    name = _slug(os.path.basename(source.split("?", 1)[0].rstrip("/")))
+    return f"{name}-{hashlib.sha256(source.encode('utf-8')).hexdigest()[:8]}"
+
+
+# Ingest, profile and render one dataset. Runs inside a worker process.
+def process_dataset(task):
+    source = task["source"]
+    out_dir = os.path.join(task["out_dir"], dataset_dir(source))
+    result = {"source": source, "charts": [], "timings": {}}
+    try:
+        started = time.perf_counter()
+        df = load_dataset(source)
+        result["timings"]["ingest"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        profile = profile_dataframe(df)
+        result["description"] = describe_dataset(df)
+        result["timings"]["profile"] = time.perf_counter() - started
+        result["rows"], result["columns"] = df.shape
+        result["kinds"] = {str(c): info["kind"] for c, info in profile["columns"].items()}
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    for index, spec in enumerate(task["charts"]):
+        chart = {"spec": spec}
+        try:
+            spec = chart["spec"] = resolve_axes(spec, profile)
+            if spec["chart_type"] not in CHART_TYPES:
+                raise ValueError(f"Unknown chart type {spec['chart_type']!r}")
+            fig = generate_plot(df, spec["chart_type"], spec.get("x"), spec.get("y"), spec.get("z"),
+                                spec.get("bins", 30), spec.get("size", 10), max_points=task["max_points"])
+            if fig is None:
+                raise ValueError("No figure for this chart type and columns")
+            path = os.path.join(out_dir, f"{index:02d}-{_slug(spec['chart_type'])}.html")
+            fig.write_html(path, include_plotlyjs=task["plotlyjs"], full_html=True)
+            chart["file"] = os.path.relpath(path, task["out_dir"])
+        except Exception as e:
+            chart["error"] = f"{type(e).__name__}: {e}"
+        result["charts"].append(chart)
+    result["timings"]["render"] = time.perf_counter() - started
+    return result
+
+
+# Offline recommender for tests and air-gapped runs: a deterministic answer derived from the description
+def stub_recommender(description):
+    return f"[stub] Recommendations for: {description[:200]}"
+
+
+def openai_recommender(model):
+    from openai import OpenAI
+
+    # OPENAI_API_KEY / OPENAI_BASE_URL come from the environment; retries are left to the dispatcher
+    client = OpenAI(max_retries=0)
+
+    def recommend(description):
+        def fetch():
+            response = client.chat.completions.create(
+                model=model,
+                messages=recommendation_messages(description),
+                max_tokens=500,
+            )
+            return response.choices[0].message.content
+        return cached_recommendation(description, model, fetch, dispatcher=openai_dispatcher)
+
+    return recommend
+
+
+# Run the whole batch: datasets fan out over a process pool, recommendations over a bounded thread pool
+def run_batch(datasets, charts, out_dir, workers=None, recommender=stub_recommender,
+              recommend_concurrency=4, max_points=FULL_POINTS, plotlyjs=True):
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as processes, ThreadPoolExecutor(max_workers=recommend_concurrency) as threads:
+        pending = {
+            processes.submit(process_dataset, {
+                "source": entry["source"], "charts": entry.get("charts") or charts,
+                "out_dir": out_dir, "max_points": max_points, "plotlyjs": plotlyjs,
+            }): entry
+            for entry in datasets
+        }
+        recommendations = {}
+        for future in as_completed(pending):
+            result = future.result()
+            results.append(result)
+            if recommender is not None and result.get("description"):
+                recommendations[threads.submit(recommender, result["description"])] = result
+        for future in as_completed(recommendations):
+            result = recommendations[future]
+            try:
+                result["recommendation"] = future.result()
+            except Exception as e:
+                result["recommendation_error"] = f"{type(e).__name__}: {e}"
+
+    results.sort(key=lambda r: r["source"])
+    report = {
+        "datasets": results,
+        "elapsed": time.perf_counter() - started,
+        "failed": sum(1 for r in results if "error" in r),
+    }
+    with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, default=str)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile, recommend and render many datasets without the Streamlit UI.")
+    parser.add_argument("input", help="directory of .csv/.xlsx/.json files, or a JSON manifest")
+    parser.add_argument("--charts", help="JSON file with a list of chart specs (default: histogram, scatter and bar)")
+    parser.add_argument("--out", default="visbot_batch", help="output directory for HTML figures and report.json")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--recommender", choices=["stub", "openai", "none"], default="stub")
+    parser.add_argument("--model", default="gpt-4-turbo")
+    parser.add_argument("--recommend-concurrency", type=int, default=4, help="concurrent recommendation requests")
+    parser.add_argument("--max-points", type=int, default=FULL_POINTS, help="point budget of scatter/line/area charts")
+    parser.add_argument("--plotlyjs", choices=["inline", "cdn"], default="inline",
+                        help="embed plotly.js in every file (works offline) or load it from the CDN")
+    args = parser.parse_args(argv)
+
+    charts = DEFAULT_CHARTS
+    if args.charts:
+        with open(args.charts, encoding="utf-8") as fh:
+            charts = json.load(fh)
+    recommender = {"stub": stub_recommender, "none": None}.get(args.recommender)
+    if args.recommender == "openai":
+        recommender = openai_recommender(args.model)
+
+    report = run_batch(
+        collect_datasets(args.input), charts, args.out, workers=args.workers, recommender=recommender,
+        recommend_concurrency=args.recommend_concurrency, max_points=args.max_points,
+        plotlyjs=True if args.plotlyjs == "inline" else "cdn",
+    )
+    print(f"{len(report['datasets'])} datasets, {report['failed']} failed, {report['elapsed']:.1f}s -> {os.path.join(args.out, 'report.json')}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import geobinning
+import profiler
+from charts import CHART_TYPES, generate_plot
+from figure_encoding import encode_figure
+from ingest import read_path
+from profiler import profile_dataframe
+from recommendations import describe_dataset
+
+
+# Reproducible benchmarks for ingestion, profiling, recommendation and every chart branch.
+#
+#   python benchmark.py --rows 10000,1000000 --formats csv,json --out bench.json
+#   python benchmark.py --baseline bench.json          # exits 1 on regressions
+#
+# Datasets are synthetic and seeded, so runs on the same machine are comparable.
+
+# Writing XLSX is slow; larger row counts skip the format instead of stalling the run
+XLSX_MAX_ROWS = 200_000
+
+# A measurement regresses when it grows past baseline * tolerance; timings also need to
+# move by more than MIN_SECONDS_DELTA so sub-millisecond noise isn't reported
+TIME_TOLERANCE = 1.5
+BYTES_TOLERANCE = 1.1
+MIN_SECONDS_DELTA = 0.05
+REPEAT = 3
+
+# Cold import time of the app module, measured in a fresh interpreter. Heavy packages (plotly.express,
+# openai, requests, pyarrow) are imported on first use, so this is mostly streamlit and pandas.
+IMPORT_MODULES = ["visbot", "charts", "ingest", "recommendations"]
+IMPORT_BUDGET = float(os.environ.get("VISBOT_IMPORT_BUDGET", "1.0"))
+
+
+# Seeded frame with numeric, low/high-cardinality text and datetime columns
+def synthetic_frame(rows, columns=8, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    kinds = ["float", "int", "category", "text", "datetime", "lat", "lon"]
+    for i in range(columns):
+        kind = kinds[i % len(kinds)] if i < len(kinds) else ("float" if i % 2 else "category")
+        name = f"{kind}_{i}"
+        if kind == "float":
+            data[name] = rng.normal(100, 25, rows)
+        elif kind == "int":
+            data[name] = rng.integers(0, 1000, rows)
+        elif kind == "category":
+            data[name] = rng.choice(["north", "south", "east", "west", "center"], rows)
+        elif kind == "text":
+            data[name] = np.char.add("id_", rng.integers(0, max(1, rows // 2), rows).astype(str))
+        elif kind == "datetime":
+            data[name] = pd.Timestamp("2020-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 3 * 365 * 86400, rows)), unit="s")
+        elif kind == "lat":
+            data[name] = rng.uniform(-60, 70, rows)
+        else:
+            data[name] = rng.uniform(-180, 180, rows)
+    return pd.DataFrame(data)
+
+
+def write_frame(df, fmt, directory):
+    path = os.path.join(directory, f"bench_{len(df)}x{df.shape[1]}.{fmt}")
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records", date_format="iso")
+    elif fmt == "xlsx":
+        df.to_excel(path, index=False)
+    return path
+
+
+# Every process-wide memo a measured step could hit: profiles, fingerprints and geo pyramids
+def clear_memos():
+    profiler.clear_memo()
+    geobinning.clear_memo()
+
+
+# Best wall time and peak traced memory of fn() over `repeat` runs.
+# Memos are cleared before each run so every repeat is measured cold.
+def measure(fn, repeat=REPEAT):
+    best, peak = float("inf"), 0
+    for _ in range(repeat):
+        clear_memos()
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            value = fn()
+        finally:
+            best = min(best, time.perf_counter() - started)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return value, {"seconds": best, "peak_bytes": peak}
+
+
+# Axes for each chart branch on the synthetic schema
+def chart_axes(df, chart_type):
+    columns = {c.split("_")[0]: c for c in df.columns}
+    if chart_type in ("Geospatial scatter map",):
+        return columns["lon"], columns["lat"], None
+    if chart_type in ("Bar Chart", "Stacked Bar Chart", "Grouped Bar Chart", "Boxplot", "Violin plot", "Pie Chart", "Sun diagram", "Choropleth map"):
+        return columns["category"], columns["float"], columns["category"]
+    if chart_type in ("Line Graph", "Area Chart"):
+        return columns["datetime"], columns["float"], None
+    return columns["float"], columns["int"], columns["lat"]
+
+
+def stub_recommendation(description):
+    return f"[stub] {len(description)} characters of description"
+
+
+# Build every chart once on a tiny frame so lazy Plotly imports don't land in the first measurement
+def warm_up(chart_types, columns):
+    df = synthetic_frame(50, columns)
+    for chart_type in chart_types:
+        generate_plot(df, chart_type, *chart_axes(df, chart_type))
+
+
+# Best cold import time of each module, each run in a fresh interpreter
+def measure_imports(modules=IMPORT_MODULES, repeat=REPEAT):
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for module in modules:
+        code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+        best = float("inf")
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+            best = min(best, float(out.stdout.strip().splitlines()[-1]))
+        results[f"import/{module}"] = {"seconds": best}
+    return results
+
+
+def run_benchmarks(rows_list, formats, columns=8, chart_types=CHART_TYPES, directory=None, repeat=REPEAT):
+    directory = directory or tempfile.mkdtemp(prefix="visbot_bench_")
+    warm_up(chart_types, columns)
+    results = {}
+    for rows in rows_list:
+        frame = synthetic_frame(rows, columns)
+        for fmt in formats:
+            if fmt == "xlsx" and rows > XLSX_MAX_ROWS:
+                continue
+            path = write_frame(frame, fmt, directory)
+            prefix = f"{fmt}/{rows}x{columns}"
+            df, results[f"{prefix}/ingest"] = measure(lambda: read_path(path), repeat)
+            _, results[f"{prefix}/profile"] = measure(lambda: profile_dataframe(df), repeat)
+            # Profile plus the description loop, i.e. everything before the model is called
+            description, results[f"{prefix}/describe"] = measure(lambda: describe_dataset(df), repeat)
+            _, results[f"{prefix}/recommend_stub"] = measure(lambda: stub_recommendation(description), repeat)
+            for chart_type in chart_types:
+                x, y, z = chart_axes(df, chart_type)
+                fig, stats = measure(lambda: generate_plot(df, chart_type, x, y, z), repeat)
+                if fig is not None:
+                    payload, serialize = measure(fig.to_json, repeat)
+                    stats["figure_bytes"] = len(payload)
+                    stats["serialize_seconds"] = serialize["seconds"]
+                    (_, report), encode = measure(lambda: encode_figure(fig), repeat)
+                    stats["encoded_bytes"] = report["after_bytes"]
+                    stats["encode_seconds"] = encode["seconds"]
+                results[f"{prefix}/chart/{chart_type}"] = stats
+            os.remove(path)
+    return results
+
+
+# Measurements that got slower, bigger or hungrier than the stored baseline
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE, bytes_tolerance=BYTES_TOLERANCE):
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric, tolerance in (("seconds", time_tolerance), ("peak_bytes", bytes_tolerance), ("figure_bytes", bytes_tolerance), ("encoded_bytes", bytes_tolerance)):
+            if metric in stats and before.get(metric):
+                ratio = stats[metric] / before[metric]
+                if metric == "seconds" and stats[metric] - before[metric] < MIN_SECONDS_DELTA:
+                    continue
+                if ratio > tolerance:
+                    regressions.append(f"{name} {metric}: {before[metric]:.4g} -> {stats[metric]:.4g} ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark VisBot ingestion, profiling and plotting on synthetic data.")
+    parser.add_argument("--rows", default="10000,100000", help="comma-separated row counts")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--formats", default="csv,json,xlsx")
+    parser.add_argument("--charts", default=",".join(CHART_TYPES), help="comma-separated chart types")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per measurement; the fastest is kept")
+    parser.add_argument("--imports", action="store_true", help="also measure cold import times against --import-budget")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="seconds allowed for a cold 'import visbot'")
+    parser.add_argument("--out", help="write results as JSON (use it later as --baseline)")
+    parser.add_argument("--baseline", help="results JSON to compare against; exits 1 on regressions")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--bytes-tolerance", type=float, default=BYTES_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        [int(r) for r in args.rows.split(",")], args.formats.split(","), columns=args.columns,
+        chart_types=[c.strip() for c in args.charts.split(",") if c.strip()], repeat=args.repeat,
+    )
+    failures = []
+    if args.imports:
+        results.update(measure_imports(repeat=args.repeat))
+        if results["import/visbot"]["seconds"] > args.import_budget:
+            failures.append(f"import/visbot took {results['import/visbot']['seconds']:.3f}s, over the {args.import_budget:.3f}s budget")
+    for name, stats in results.items():
+        extra = f"  {stats['figure_bytes'] / 1e6:8.2f} MB json" if "figure_bytes" in stats else ""
+        if "encoded_bytes" in stats:
+            extra += f"  {stats['encoded_bytes'] / 1e6:8.2f} MB encoded"
+        peak = f"  peak {stats['peak_bytes'] / 1e6:8.1f} MB" if "peak_bytes" in stats else ""
+        print(f"{name:55s} {stats['seconds']:9.3f}s{peak}{extra}")
+    for line in failures:
+        print(f"BUDGET {line}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.time_tolerance, args.bytes_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions or failures else 0
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+import collections
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+import plotly.io as pio
+
+import columnar as columnar_store
+
+
+# Default budgets, overridable from the environment
+DEFAULT_MEMORY_BYTES = int(os.environ.get("VISBOT_CACHE_MEMORY_MB", "512")) * 1024 * 1024
+DEFAULT_DISK_BYTES = int(os.environ.get("VISBOT_CACHE_DISK_MB", "2048")) * 1024 * 1024
+DEFAULT_DISK_DIR = os.environ.get("VISBOT_CACHE_DIR") or None
+
+
+# Approximate in-memory size of a cached object
+def object_nbytes(obj):
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# Two-tier (memory LRU + optional disk) cache for parsed datasets
+class DatasetCache:
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, disk_dir=DEFAULT_DISK_DIR, disk_max_bytes=DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = collections.OrderedDict()  # key -> (value, nbytes, expires_at)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, nbytes, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop(key)
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_put(key, value, None)
+        return value
+
+    # Memory-tier membership test that doesn't touch LRU order or hit/miss counters
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.time())
+
+    # Whether this very object (not an equal one) is held in the memory tier
+    def holds(self, value):
+        with self._lock:
+            return any(entry[0] is value for entry in self._entries.values())
+
+    def put(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+        # Entries with a TTL are tied to this process, don't persist them
+        if ttl is None:
+            self._disk_put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _memory_put(self, key, value, expires_at):
+        nbytes = object_nbytes(value)
+        if key in self._entries:
+            self._drop(key)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, nbytes, expires_at)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)  # mtime doubles as the disk LRU clock
+        return value
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._disk_evict()
+
+    def _disk_evict(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.evictions += 1
+
+
+# Content hash of an uploaded file (Streamlit UploadedFile or any file-like object)
+def fingerprint_upload(uploaded_file):
+    digest = hashlib.sha256()
+    digest.update(getattr(uploaded_file, "name", "").encode("utf-8"))
+    if hasattr(uploaded_file, "getvalue"):
+        digest.update(uploaded_file.getvalue())
+    else:
+        position = uploaded_file.tell()
+        uploaded_file.seek(0)
+        for block in iter(lambda: uploaded_file.read(1024 * 1024), b""):
+            digest.update(block)
+        uploaded_file.seek(position)
+    return digest.hexdigest()
+
+
+# Process-wide cache shared by every Streamlit session and rerun
+dataset_cache = DatasetCache()
+
+
+# Read a dataset through the cache, calling reader(source) only on a miss.
+# URLs are cached by ingest.read_url itself, which revalidates them with conditional GETs.
+# variant distinguishes different loads of the same bytes (e.g. projected columns).
+# columnar=True keeps a memory-mapped Arrow copy (see columnar.py) so later loads skip parsing.
+def cached_read(file_path_or_url, reader, cache=None, variant=None, columnar=False):
+    if isinstance(file_path_or_url, str):
+        return reader(file_path_or_url)
+    cache = cache or dataset_cache
+    key = fingerprint_upload(file_path_or_url)
+    if variant:
+        key = hashlib.sha256(f"{key}|{variant!r}".encode("utf-8")).hexdigest()
+    df = cache.get(key)
+    if df is None:
+        df = columnar_store.reopen(key) if columnar else None
+        if df is None:
+            df = reader(file_path_or_url)
+            if columnar and columnar_store.materialize(key, df):
+                df = columnar_store.reopen(key)
+        cache.put(key, df)
+    elif columnar and not columnar_store.has(key):
+        columnar_store.materialize(key, df)
+    return df
+
+
+DEFAULT_FIGURE_BYTES = int(os.environ.get("VISBOT_FIGURE_CACHE_MB", "128")) * 1024 * 1024
+
+
+# Memory-only LRU of serialized Plotly figures, keyed by dataset fingerprint and chart parameters
+class FigureCache(DatasetCache):
+    def __init__(self, max_bytes=DEFAULT_FIGURE_BYTES):
+        super().__init__(max_bytes=max_bytes, disk_dir=None)
+        self._keys_by_dataset = collections.defaultdict(set)
+        self._dataset_by_key = {}
+
+    def key(self, dataset_key, params):
+        return hashlib.sha256(f"{dataset_key}|{params!r}".encode("utf-8")).hexdigest()
+
+    def put_figure(self, dataset_key, params, fig):
+        key = self.key(dataset_key, params)
+        serialized = fig.to_json()
+        with self._lock:
+            self.put(key, serialized)
+            if key in self._entries:
+                self._keys_by_dataset[dataset_key].add(key)
+                self._dataset_by_key[key] = dataset_key
+
+    def has_figure(self, dataset_key, params):
+        return self.key(dataset_key, params) in self
+
+    def get_figure(self, dataset_key, params):
+        serialized = self.get(self.key(dataset_key, params))
+        if serialized is None:
+            return None
+        return pio.from_json(serialized, skip_invalid=True)
+
+    # Drop every figure built from a dataset
+    def invalidate_dataset(self, dataset_key):
+        with self._lock:
+            for key in self._keys_by_dataset.pop(dataset_key, ()):
+                if key in self._entries:
+                    self._drop(key)
+
+    # Keep the per-dataset index in step with evictions and expiry
+    def _drop(self, key):
+        super()._drop(key)
+        dataset_key = self._dataset_by_key.pop(key, None)
+        keys = self._keys_by_dataset.get(dataset_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_dataset[dataset_key]
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._keys_by_dataset.clear()
+            self._dataset_by_key.clear()
+
+
+figure_cache = FigureCache()
+
+
+# Build a figure through the figure cache. build() is called only on a miss; None results aren't cached.
+def cached_figure(dataset_key, params, build, cache=None):
+    cache = cache or figure_cache
+    fig = cache.get_figure(dataset_key, params)
+    if fig is None:
+        fig = build()
+        if fig is not None:
+            cache.put_figure(dataset_key, params, fig)
+    return fig
+
+
+# Default budget of the shared dataset store and how long an idle session keeps its reference
+DEFAULT_SHARED_BYTES = int(os.environ.get("VISBOT_SHARED_STORE_MB", "2048")) * 1024 * 1024
+DEFAULT_SESSION_TTL = int(os.environ.get("VISBOT_SESSION_TTL", "1800"))
+
+
+# Process-wide store of the frames sessions are working with, keyed by content fingerprint
+# (profiler.dataset_fingerprint, a hash of every value).
+# Sessions that load the same data (from any URL, upload or read option) get the same frame
+# object; pandas copy-on-write keeps it read-only from each session's point of view.
+# Each session holds at most one reference; entries nobody references are evicted LRU once
+# the store is over budget. Referenced entries are never evicted.
+# max_bytes is the budget of every resident dataset: a frame the dataset cache also holds is
+# charged to the cache only, and the cache's bytes count against this budget too.
+class SharedDatasetStore:
+    def __init__(self, max_bytes=DEFAULT_SHARED_BYTES, session_ttl=DEFAULT_SESSION_TTL, cache=None):
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.cache = cache
+        self._entries = collections.OrderedDict()  # key -> (frame, nbytes)
+        self._refs = collections.defaultdict(set)  # key -> session ids
+        self._sessions = {}  # session id -> (key, last seen)
+        self._lock = threading.RLock()
+        self.deduplicated = 0
+        self.evictions = 0
+
+    # The shared frame for df's contents, referenced by session_id until it acquires another
+    # dataset, releases, or stays idle for longer than session_ttl
+    def acquire(self, session_id, df, key):
+        with self._lock:
+            self._release(session_id)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = (df, object_nbytes(df))
+            else:
+                self._entries.move_to_end(key)
+                if entry[0] is not df:
+                    self.deduplicated += 1
+            self._refs[key].add(session_id)
+            self._sessions[session_id] = (key, time.time())
+            self._expire_sessions()
+            self._evict()
+            return entry[0]
+
+    def release(self, session_id):
+        with self._lock:
+            self._release(session_id)
+            self._evict()
+
+    def _release(self, session_id):
+        key, _ = self._sessions.pop(session_id, (None, None))
+        if key is not None:
+            self._refs[key].discard(session_id)
+            if not self._refs[key]:
+                del self._refs[key]
+
+    def _expire_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        for session_id in [s for s, (_, seen) in self._sessions.items() if seen < cutoff]:
+            self._release(session_id)
+
+    # Bytes of an entry not already charged to the dataset cache
+    def _charge(self, entry):
+        frame, nbytes = entry
+        return 0 if self.cache is not None and self.cache.holds(frame) else nbytes
+
+    def _cache_bytes(self):
+        return self.cache.stats()["bytes"] if self.cache is not None else 0
+
+    def _evict(self):
+        charges = {key: self._charge(entry) for key, entry in self._entries.items()}
+        total = sum(charges.values()) + self._cache_bytes()
+        for key, charge in charges.items():
+            if total <= self.max_bytes:
+                break
+            if key not in self._refs and charge:
+                del self._entries[key]
+                total -= charge
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            charges = {key: self._charge(entry) for key, entry in self._entries.items()}
+            own = sum(charges.values())
+            cache_bytes = self._cache_bytes()
+            return {
+                "entries": len(self._entries),
+                "referenced_entries": len(self._refs),
+                "sessions": len(self._sessions),
+                "bytes": own,
+                "cache_bytes": cache_bytes,
+                "total_bytes": own + cache_bytes,
+                "referenced_bytes": sum(self._entries[key][1] for key in self._refs if key in self._entries),
+                "max_bytes": self.max_bytes,
+                "deduplicated": self.deduplicated,
+                "evictions": self.evictions,
+            }
+
+
+shared_store = SharedDatasetStore(cache=dataset_cache)
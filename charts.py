@@ -0,0 +1,105 @@
+import pandas as pd
+
+from aggregation import bar_sums, heatmap_counts, histogram_bins, value_counts
+from downsampling import FULL_POINTS, downsample_series, render_mode, stratified_sample, stratify_column
+from geobinning import GRIDS, LEVEL_DEGREES, geo_pyramid, location_values
+from instrumentation import timed
+
+
+CHART_TYPES = [
+    "Scatter Plot", "Bar Chart", "Stacked Bar Chart", "Grouped Bar Chart",
+    "Histogram", "Line Graph", "Area Chart", "Boxplot", "Pie Chart",
+    "3D Scatter Plot", "Violin plot", "Heat map",
+    "Geospatial scatter map", "Choropleth map", "Sun diagram"
+]
+
+POINT_CHART_TYPES = ["Scatter Plot", "3D Scatter Plot", "Line Graph", "Area Chart"]
+
+
+# Bars show the sum of y per x (and color group); numeric y is summed here instead of in the browser
+def bar_data(df, x_axis, y_axis, color=None):
+    if pd.api.types.is_numeric_dtype(df[y_axis]) and y_axis not in (x_axis, color):
+        return bar_sums(df, x_axis, y_axis, color)
+    return df
+
+
+# Point counts per grid cell as a bounded-size density layer; geo_level=None picks the finest
+# level with at most max_cells cells
+def geo_density(df, lon, lat, max_cells=FULL_POINTS, geo_level=None, geo_grid="square"):
+    import plotly.express as px
+
+    grid = geo_grid if geo_grid in GRIDS else "square"
+    pyramid = geo_pyramid(df, lat, lon)
+    level = pyramid.auto_level(max_cells, grid) if geo_level is None else geo_level
+    cells = pyramid.level(level, grid)
+    fig = px.scatter_geo(cells, lat="lat", lon="lon", color="count", size="count", hover_data={"count": True},
+                         title=f'Geospatial density of {lon} and {lat} ({len(cells):,} {grid} cells of {LEVEL_DEGREES[level]:g}°, {pyramid.points:,} points)')
+    fig.update_traces(marker_symbol="hexagon" if grid == "hex" else "square")
+    return fig
+
+
+# Function to generate charts depending on selected data types and chart type.
+# Aggregate chart types are pre-aggregated (see aggregation.py) so the figure holds bins/groups, not rows.
+# Point-based chart types are reduced to max_points (see downsampling.py) and drawn with WebGL when large.
+# Geospatial scatter maps above max_points rows (or with an explicit geo_level) show grid-cell counts
+# from the dataset's grid pyramid (see geobinning.py); geo_grid is "square" or "hex".
+# Choropleths combine the values of each location with location_aggregation (see geobinning.location_values).
+@timed("generate_plot")
+def generate_plot(df, chart_type, x_axis=None, y_axis=None, z_axis=None, hist_bins=30, scatter_size=10, max_points=FULL_POINTS,
+                  geo_level=None, geo_grid="square", location_aggregation="mean"):
+    # Plotly Express takes a noticeable share of startup; it's loaded on the first chart instead
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    fig = None
+    if chart_type == "Scatter Plot":
+        points = stratified_sample(df, max_points, by=stratify_column(df, [x_axis, y_axis]))
+        fig = px.scatter(points, x=x_axis, y=y_axis, title=f'Scatter plot from {x_axis} vs {y_axis}', size_max=scatter_size, render_mode=render_mode(len(points)))
+    elif chart_type == "Bar Chart":
+        fig = px.bar(bar_data(df, x_axis, y_axis), x=x_axis, y=y_axis, title=f'Bar chart from {x_axis} vs {y_axis}')
+    elif chart_type == "Stacked Bar Chart":
+        fig = px.bar(bar_data(df, x_axis, y_axis, z_axis), x=x_axis, y=y_axis, color=z_axis, title=f'Stacked Bar Chart from {x_axis} vs {y_axis} for {z_axis}', barmode='stack')
+    elif chart_type == "Grouped Bar Chart":
+        fig = px.bar(bar_data(df, x_axis, y_axis, z_axis), x=x_axis, y=y_axis, color=z_axis, title=f'Grouped Bar Chart from {x_axis} vs {y_axis} for {z_axis}', barmode='group')
+    elif chart_type == "Histogram":
+        bins, width = histogram_bins(df[x_axis], hist_bins)
+        fig = px.bar(bins, x="bin", y="count", labels={"bin": x_axis}, title=f'Histogram from {x_axis}')
+        if width is not None:
+            fig.update_traces(width=width)
+        fig.update_layout(bargap=0)
+    elif chart_type == "Line Graph":
+        points = downsample_series(df, x_axis, y_axis, max_points)
+        fig = px.line(points, x=x_axis, y=y_axis, title=f'Line Graph from {x_axis} vs {y_axis}', render_mode=render_mode(len(points)))
+    elif chart_type == "Area Chart":
+         points = downsample_series(df, x_axis, y_axis, max_points)
+         if render_mode(len(points)) == "webgl":
+             # px.area has no WebGL mode; a filled WebGL line draws the same single series
+             fig = px.line(points, x=x_axis, y=y_axis, title=f'Area Chart from {x_axis} vs {y_axis}', render_mode="webgl")
+             fig.update_traces(fill="tozeroy")
+         else:
+             fig = px.area(points, x=x_axis, y=y_axis, title=f'Area Chart from {x_axis} vs {y_axis}')
+    elif chart_type == "Pie Chart":
+         fig = px.pie(value_counts(df, [x_axis]), names=x_axis, values="count", title=f'Pie Chart from {x_axis}')
+    elif chart_type == "3D Scatter Plot":
+         points = stratified_sample(df, max_points, by=stratify_column(df, [z_axis, x_axis, y_axis]))
+         fig = px.scatter_3d(points, x=x_axis, y=y_axis, z=z_axis, title=f'Scatter plot 3D from {x_axis}, {y_axis} and {z_axis}')
+    elif chart_type == "Boxplot":
+         fig = px.box(df, x=x_axis, y=y_axis, title=f'Boxplot from {x_axis} vs {y_axis}')
+    elif chart_type == "Violin plot":
+         fig = px.violin(df, x=x_axis, y=y_axis, title=f'Violin from {x_axis} vs {y_axis}')
+    elif chart_type == "Heat map":
+         x_bins, y_bins, counts = heatmap_counts(df[x_axis], df[y_axis], hist_bins)
+         fig = go.Figure(go.Heatmap(x=x_bins, y=y_bins, z=counts, colorbar={"title": "count"}))
+         fig.update_layout(title=f'Heatmap from {x_axis} vs {y_axis}', xaxis_title=x_axis, yaxis_title=y_axis)
+    elif chart_type == "Geospatial scatter map":
+         if geo_level is None and len(df) <= max_points:
+             fig = px.scatter_geo(df, lat=y_axis, lon=x_axis, title=f'Geospatial scatter map from {x_axis} and {y_axis}')
+         else:
+             fig = geo_density(df, x_axis, y_axis, max_points, geo_level, geo_grid)
+    elif chart_type == "Choropleth map":
+         locations, color = location_values(df, x_axis, y_axis, location_aggregation)
+         fig = px.choropleth(locations, locations=x_axis, color=color, title=f'Choropleth map from {x_axis} and {y_axis}')
+    elif chart_type == "Sun diagram":
+         fig = px.sunburst(value_counts(df, [x_axis]), path=[x_axis], values="count", title=f'Sun diagram from {x_axis} and {y_axis}')
+    
+    return fig
@@ -0,0 +1,85 @@
+import importlib.util
+import os
+import tempfile
+
+import pandas as pd
+
+
+# Arrow IPC files written here are reopened memory-mapped instead of re-parsing CSV/XLSX/JSON
+STORE_DIR = os.environ.get("VISBOT_COLUMNAR_DIR") or os.path.join(tempfile.gettempdir(), "visbot_columnar")
+STORE_MAX_BYTES = int(os.environ.get("VISBOT_COLUMNAR_MB", "8192")) * 1024 * 1024
+
+
+# pyarrow is optional, and only imported once the store is used
+def available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _path(key):
+    return os.path.join(STORE_DIR, f"{key}.arrow")
+
+
+def has(key):
+    return available() and os.path.exists(_path(key))
+
+
+# Write a parsed frame as an uncompressed Arrow IPC file. Uncompressed buffers can be
+# memory-mapped without a decode step, which Parquet pages can't. Returns False if the
+# frame has values Arrow can't represent.
+def materialize(key, df):
+    if not available():
+        return False
+    import pyarrow as pa
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return False
+    path = _path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    _evict()
+    return True
+
+
+# Arrow-backed pandas dtype for every column except dictionary-encoded ones, which come back as
+# pandas categoricals (compaction and the chunked CSV reader produce them, and plotting and
+# grouping code expects `category`, not Arrow dictionaries)
+def _pandas_dtype(arrow_type):
+    import pyarrow as pa
+
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+
+# Reopen a materialized frame memory-mapped, with Arrow-backed pandas dtypes. Only the
+# projected columns are wrapped, and pages are read from disk when a column is first touched.
+def reopen(key, columns=None):
+    if not has(key):
+        return None
+    import pyarrow as pa
+
+    path = _path(key)
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    if columns:
+        table = table.select([c for c in columns if c in table.column_names])
+    os.utime(path)  # mtime doubles as the LRU clock
+    return table.to_pandas(types_mapper=_pandas_dtype, self_destruct=False)
+
+
+def _evict():
+    files = []
+    for name in os.listdir(STORE_DIR):
+        if name.endswith(".arrow"):
+            path = os.path.join(STORE_DIR, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= STORE_MAX_BYTES:
+            break
+        os.remove(path)
+        total -= size
@@ -0,0 +1,99 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import frame_bytes
+
+
+# Text columns become `category` when they have at most this many distinct values and
+# repeat each value at least twice on average (otherwise the codes cost more than they save)
+CATEGORY_MAX_DISTINCT = int(os.environ.get("VISBOT_CATEGORY_MAX_DISTINCT", "1000"))
+CATEGORY_MAX_RATIO = 0.5
+
+# Text columns are parsed as datetimes when this many sampled values all look like dates
+DATETIME_SAMPLE = 1000
+_DATE_PATTERN = re.compile(r"^\s*\d{4}-\d{1,2}-\d{1,2}([T ]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?\s*$")
+
+# Compaction is opt-in; the sidebar checkbox starts from this value. Columns it turns into
+# categories are described to the model as categorical, like any other category column.
+COMPACT_BY_DEFAULT = os.environ.get("VISBOT_COMPACT_DTYPES", "0") in ("1", "true", "yes")
+
+
+def _is_text(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+# ISO dates parsed only when every sampled value looks like one and no value is lost
+def _as_datetime(series):
+    values = series.dropna()
+    if values.empty:
+        return None
+    sample = values.iloc[:DATETIME_SAMPLE]
+    if not all(isinstance(v, str) and _DATE_PATTERN.match(v) for v in sample):
+        return None
+    parsed = pd.to_datetime(series, format="ISO8601", errors="coerce")
+    if parsed.isna().sum() != series.isna().sum():
+        return None
+    return parsed
+
+
+def _as_category(series):
+    values = series.dropna()
+    if values.empty:
+        return None
+    distinct = values.nunique()
+    if distinct > CATEGORY_MAX_DISTINCT or distinct > len(values) * CATEGORY_MAX_RATIO:
+        return None
+    return series.astype("category")
+
+
+# Smallest integer type holding the range, or float32 when every value round-trips exactly
+def _downcast(series):
+    if pd.api.types.is_bool_dtype(series) or not isinstance(series.dtype, np.dtype):
+        return None
+    if pd.api.types.is_integer_dtype(series):
+        smaller = pd.to_numeric(series, downcast="integer")
+        if pd.api.types.is_unsigned_integer_dtype(series):
+            smaller = pd.to_numeric(series, downcast="unsigned")
+        return smaller if smaller.dtype.itemsize < series.dtype.itemsize else None
+    if pd.api.types.is_float_dtype(series) and series.dtype.itemsize > 4:
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        with np.errstate(over="ignore"):
+            if np.array_equal(narrowed.astype(values.dtype), values, equal_nan=True):
+                return pd.Series(narrowed, index=series.index, name=series.name)
+    return None
+
+
+# Shrink a freshly loaded frame without changing any value: ISO date strings become datetimes,
+# repetitive strings become categories and numbers get the narrowest lossless type.
+# Returns the compacted frame and a report of memory before/after and the columns changed.
+def compact_dataframe(df):
+    before = frame_bytes(df)
+    converted = {}
+    changes = {}
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        if _is_text(series):
+            result = _as_datetime(series)
+            if result is None:
+                result = _as_category(series)
+        elif pd.api.types.is_numeric_dtype(series):
+            result = _downcast(series)
+        else:
+            result = None
+        if result is not None:
+            converted[position] = result
+            changes[str(column)] = f"{series.dtype} -> {result.dtype}"
+
+    if converted:
+        compacted = df.copy(deep=False)
+        for position, result in converted.items():
+            compacted.isetitem(position, result)
+    else:
+        compacted = df
+    report = {"before_bytes": before, "after_bytes": frame_bytes(compacted), "columns": changes}
+    compacted.attrs = {**df.attrs, "compaction": report}
+    return compacted, report
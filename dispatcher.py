@@ -0,0 +1,181 @@
+import collections
+import contextlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+
+# Upstream calls in flight at once across every session of this process; the rest wait in line
+MAX_CONCURRENT = int(os.environ.get("VISBOT_OPENAI_CONCURRENCY", "4"))
+# Longest a request waits in line before giving up
+QUEUE_TIMEOUT = float(os.environ.get("VISBOT_OPENAI_QUEUE_TIMEOUT", "120"))
+# Retries of rate-limited (429) and server (5xx) errors, with full-jitter exponential backoff
+MAX_RETRIES = int(os.environ.get("VISBOT_OPENAI_RETRIES", "5"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Latencies kept for the percentile metrics
+LATENCY_WINDOW = 500
+
+
+class DispatcherBusy(TimeoutError):
+    pass
+
+
+# 429, 5xx and connection failures are worth retrying; other errors (bad request, auth) are not
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+# Seconds the server asked us to wait, if the error carries a Retry-After header
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Gatekeeper in front of a shared API client:
+#   dispatcher.call(key, fn)          identical in-flight keys share one call; limited and retried
+#   with dispatcher.hold(fn) as r:    r = fn() limited and retried, slot kept until the block ends (e.g. a stream)
+#   with dispatcher.slot(): ...       hold one of the concurrency slots
+# Limited calls take a slot per attempt and give it back while backing off, so a rate-limited
+# request never keeps other requests waiting.
+class Dispatcher:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, queue_timeout=QUEUE_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, sleep=time.sleep):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.waiting = 0
+        self.active = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self._queue_seconds = collections.deque(maxlen=LATENCY_WINDOW)
+        self._call_seconds = collections.deque(maxlen=LATENCY_WINDOW)
+
+    @contextlib.contextmanager
+    def slot(self):
+        queued = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+                self.calls += 1
+                self._queue_seconds.append(time.perf_counter() - queued)
+        if not acquired:
+            raise DispatcherBusy(f"Too many AI requests in progress; gave up after waiting {self.queue_timeout:.0f}s.")
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+                self._call_seconds.append(time.perf_counter() - started)
+            self._slots.release()
+
+    # True if the error should be retried after a backoff, counting the failure otherwise
+    def _should_retry(self, error, attempt):
+        if attempt < self.max_retries and is_retryable(error) and not isinstance(error, DispatcherBusy):
+            return True
+        with self._lock:
+            self.failures += 1
+        return False
+
+    # Sleep before the next attempt; a server-supplied Retry-After is honoured up to backoff_max
+    def _backoff(self, error, attempt):
+        delay = _retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        else:
+            delay = min(max(delay, 0.0), self.backoff_max)
+        with self._lock:
+            self.retries += 1
+        self._sleep(delay)
+
+    @contextlib.contextmanager
+    def hold(self, fn):
+        for attempt in range(self.max_retries + 1):
+            with self.slot():
+                try:
+                    result = fn()
+                except Exception as e:
+                    if not self._should_retry(e, attempt):
+                        raise
+                    error = e
+                else:
+                    yield result
+                    return
+            self._backoff(error, attempt)
+
+    # fn() limited and retried
+    def limited(self, fn):
+        with self.hold(fn) as result:
+            return result
+
+    # Result of fn(), shared with every caller that asks for the same key while it's running
+    def call(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self.limited(fn))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            queue_seconds, call_seconds = list(self._queue_seconds), list(self._call_seconds)
+            return {
+                "waiting": self.waiting, "active": self.active, "in_flight_keys": len(self._inflight),
+                "calls": self.calls, "coalesced": self.coalesced, "retries": self.retries, "failures": self.failures,
+                "queue_p50": _percentile(queue_seconds, 0.5), "queue_p95": _percentile(queue_seconds, 0.95),
+                "call_p50": _percentile(call_seconds, 0.5), "call_p95": _percentile(call_seconds, 0.95),
+            }
+
+    # Current stats in Prometheus text exposition format
+    def to_prometheus(self, name="openai"):
+        lines = []
+        for field, value in self.stats().items():
+            if value is not None:
+                lines.append(f"# TYPE visbot_dispatcher_{field} gauge")
+                lines.append(f'visbot_dispatcher_{field}{{client="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every session of this process
+openai_dispatcher = Dispatcher()
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Point budgets for point-based charts: a quick preview first, then the refined figure
+PREVIEW_POINTS = int(os.environ.get("VISBOT_PREVIEW_POINTS", "5000"))
+FULL_POINTS = int(os.environ.get("VISBOT_FULL_POINTS", "50000"))
+
+# Above this many points, 2D traces switch to WebGL rendering
+WEBGL_THRESHOLD = int(os.environ.get("VISBOT_WEBGL_THRESHOLD", "1000"))
+
+# Every category keeps at least this many points in a stratified sample
+MIN_PER_CATEGORY = 20
+MAX_CATEGORIES = 1000
+
+
+def _numeric_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return None
+
+
+# Largest-Triangle-Three-Buckets: positions of n_out points that preserve the shape of y(x).
+# x must be sorted ascending.
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the next bucket is the third vertex of the triangle
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        area = np.abs((x[previous] - avg_x) * (bucket_y - y[previous]) - (x[previous] - bucket_x) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+# Shape-preserving reduction of a line/area series to about max_points rows, sorted by x
+def downsample_series(df, x, y, max_points):
+    if len(df) <= max_points:
+        return df
+    frame = df[[c for c in dict.fromkeys([x, y])]].dropna()
+    x_values = _numeric_values(frame[x])
+    y_values = _numeric_values(frame[y])
+    if x_values is None or y_values is None:
+        # Text axes have no shape to preserve; keep an evenly spaced subset
+        step = int(np.ceil(len(frame) / max_points))
+        return frame.iloc[::step]
+    order = np.argsort(x_values, kind="stable")
+    keep = lttb_indices(x_values[order], y_values[order], max_points)
+    return frame.iloc[order[keep]]
+
+
+# Uniform sample of max_points rows that keeps rare categories of `by` visible
+def stratified_sample(df, max_points, by=None, seed=0):
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(seed)
+    if by is None or df[by].nunique(dropna=False) > MAX_CATEGORIES:
+        return df.iloc[np.sort(rng.choice(len(df), size=max_points, replace=False))]
+
+    codes, uniques = pd.factorize(df[by], use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    quota = np.maximum(np.floor(sizes * (max_points / len(df))), np.minimum(sizes, MIN_PER_CATEGORY)).astype(np.int64)
+    # Rank rows within their category in random order; keep the first `quota` of each
+    order = np.lexsort((rng.random(len(df)), codes))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.empty(len(df), dtype=np.int64)
+    rank[order] = np.arange(len(df)) - np.repeat(starts, sizes)
+    return df.iloc[np.flatnonzero(rank < quota[codes])]
+
+
+# Low-cardinality column among the plotted ones, used to stratify scatter samples
+def stratify_column(df, columns):
+    for column in columns:
+        if column is None or column not in df:
+            continue
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series):
+            if series.nunique(dropna=False) <= MAX_CATEGORIES:
+                return column
+    return None
+
+
+# Plotly render_mode for 2D point traces of this size
+def render_mode(n_points):
+    return "webgl" if n_points > WEBGL_THRESHOLD else "svg"
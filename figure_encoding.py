@@ -0,0 +1,171 @@
+import base64
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Encode figures before they are cached and sent to the browser; the sidebar checkbox starts from this value
+ENCODE_BY_DEFAULT = os.environ.get("VISBOT_ENCODE_FIGURES", "1") not in ("0", "false", "no")
+
+# float64 arrays are sent as float32 when rounding moves no value by more than this fraction of the array's range
+FLOAT32_TOLERANCE = 1e-5
+
+# Text axes with at most this many labels are sent as integer codes with one tick per label
+# (an array of ticks is always drawn in full, unlike a category axis that thins its labels)
+MAX_DICTIONARY_LABELS = 60
+
+# Trace types whose x/y sit on cartesian axes that can take numeric codes instead of labels
+CARTESIAN_TRACES = ("scatter", "scattergl", "bar", "box", "violin", "heatmap")
+
+# plotly.js typed array names; there's no 64-bit integer type
+_TYPED = {"float64": "f8", "float32": "f4", "int8": "i1", "uint8": "u1", "int16": "i2", "uint16": "u2", "int32": "i4", "uint32": "u4"}
+_NUMPY = {code: np.dtype(name) for name, code in _TYPED.items()}
+_INTEGERS = (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32)
+
+
+def _is_typed(value):
+    return isinstance(value, dict) and "bdata" in value and "dtype" in value
+
+
+def _decode(spec):
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=_NUMPY[spec["dtype"]].newbyteorder("<"))
+    if spec.get("shape"):
+        values = values.reshape([int(n) for n in str(spec["shape"]).split(",")])
+    return values
+
+
+# float32 copy of a float64 array if that's lossless at plotting precision, else the array itself
+def _narrow_float(values):
+    finite = np.isfinite(values)
+    if not finite.any():
+        return values.astype(np.float32)
+    kept = values[finite]
+    low, high = kept.min(), kept.max()
+    if max(abs(low), abs(high)) > np.finfo(np.float32).max:
+        return values
+    narrowed = values.astype(np.float32)
+    error = np.abs(narrowed[finite].astype(np.float64) - kept).max()
+    return narrowed if error <= (high - low) * FLOAT32_TOLERANCE else values
+
+
+# Numeric array in the smallest plotly.js typed array that holds it, as {"dtype", "bdata"[, "shape"]};
+# None for arrays that have no typed form (text, booleans, integers beyond 53 bits)
+def typed_array(values):
+    kind = values.dtype.kind
+    if kind in "iu":
+        if not values.size:
+            return None
+        low, high = values.min(), values.max()
+        for dtype in _INTEGERS:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                values = values.astype(dtype)
+                break
+        else:
+            if max(abs(int(low)), abs(int(high))) > 2 ** 53:
+                return None
+            values = values.astype(np.float64)
+    elif kind == "f":
+        values = _narrow_float(values.astype(np.float64)) if values.dtype.itemsize > 4 else values.astype(np.float32)
+    else:
+        return None
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+    spec = {"dtype": _TYPED[values.dtype.name], "bdata": base64.b64encode(values).decode("ascii")}
+    if values.ndim > 1:
+        spec["shape"] = ", ".join(str(n) for n in values.shape)
+    return spec
+
+
+# Re-encode every numpy array of a trace (plotly keeps numpy arrays only for data attributes,
+# settings such as domains are plain lists and are left alone)
+def _encode_arrays(node, counts):
+    items = node.items() if isinstance(node, dict) else enumerate(node)
+    for key, value in items:
+        if _is_typed(value) or isinstance(value, np.ndarray):
+            values = _decode(value) if _is_typed(value) else value
+            spec = typed_array(values)
+            if spec is not None:
+                node[key] = spec
+                counts["typed_arrays"] += 1
+                counts["float32_arrays"] += spec["dtype"] == "f4" and values.dtype != np.float32
+        elif isinstance(value, dict) or (isinstance(value, list) and value and isinstance(value[0], dict)):
+            _encode_arrays(value, counts)
+
+
+def _is_text(values):
+    if _is_typed(values):
+        return False
+    values = np.asarray(values)
+    return values.dtype.kind == "U" or (values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == "string")
+
+
+# Whether codes plus one tick per label serialize smaller than repeating the labels (a quoted label and
+# a comma per point, against about two base64 characters per code and the tick arrays)
+def _dictionary_pays(codes, labels):
+    lengths = np.array([len(str(label)) for label in labels])
+    repeated = (np.bincount(codes[codes >= 0], minlength=len(labels)) * (lengths + 3)).sum()
+    return 2 * len(codes) + (lengths + 8).sum() + 80 < repeated
+
+
+# Text x/y of cartesian traces as integer codes. Labels are collected per axis in order of first
+# appearance (the order a category axis would use) and each one becomes a tick of the now linear
+# axis; plotly.js also uses the tick text for hover labels. Returns {axis: label count}.
+def _encode_dictionary_axes(data, layout):
+    uses = {}
+    for trace in data:
+        for key in ("x", "y"):
+            axis = f"{key}axis" + (trace.get(f"{key}axis") or key)[1:]
+            entry = uses.setdefault(axis, [])
+            cartesian = trace.get("type", "scatter") in CARTESIAN_TRACES
+            if trace.get(key) is not None and cartesian and _is_text(trace[key]):
+                entry.append((trace, key))
+            elif cartesian:
+                entry.append(None)
+
+    encoded = {}
+    for axis, entries in uses.items():
+        settings = layout.get(axis) or {}
+        if not entries or None in entries or settings.get("type") not in (None, "-", "category"):
+            continue
+        order = settings.get("categoryorder", "trace")
+        if order not in ("trace", "array"):
+            continue
+        values = [np.asarray(trace[key], dtype=object) for trace, key in entries]
+        seed = [str(label) for label in settings.get("categoryarray") or []] if order == "array" else []
+        codes, labels = pd.factorize(np.concatenate([np.asarray(seed, dtype=object)] + values))
+        codes = codes[len(seed):]
+        if len(labels) > MAX_DICTIONARY_LABELS or not _dictionary_pays(codes, labels):
+            continue
+        if (codes < 0).any():
+            codes = np.where(codes < 0, np.nan, codes)
+        start = 0
+        for (trace, key), part in zip(entries, values):
+            trace[key] = codes[start:start + len(part)]
+            start += len(part)
+        layout[axis] = {
+            **{name: value for name, value in settings.items() if name not in ("categoryorder", "categoryarray")},
+            "type": "linear", "tickmode": "array", "tickvals": list(range(len(labels))), "ticktext": [str(label) for label in labels],
+        }
+        encoded[axis] = len(labels)
+    return encoded
+
+
+# Compact copy of a Plotly figure for the browser: numeric arrays become base64 typed arrays
+# (float64 narrowed to float32 where that's invisible), and repeated text on x/y axes becomes
+# integer codes plus one tick label per category. Returns the encoded figure and a report of
+# payload bytes before/after, as serialized by st.plotly_chart.
+def encode_figure(fig):
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    before = len(pio.to_json(fig, validate=False))
+    spec = fig.to_dict()
+    layout = spec.setdefault("layout", {})
+    axes = _encode_dictionary_axes(spec["data"], layout)
+    counts = {"typed_arrays": 0, "float32_arrays": 0}
+    for trace in spec["data"]:
+        _encode_arrays(trace, counts)
+    encoded = go.Figure(spec)
+    report = {"before_bytes": before, "after_bytes": len(pio.to_json(encoded, validate=False)), "dictionary_axes": axes, **counts}
+    return encoded, report
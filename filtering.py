@@ -0,0 +1,171 @@
+import collections
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from profiler import dataset_fingerprint, profile_dataframe
+
+
+# Columns with up to this many distinct values get a category code map (multiselect filter)
+MAX_FILTER_CATEGORIES = 500
+
+_MEMO_SIZE = 16
+_memo = collections.OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _is_datetime(series):
+    return pd.api.types.is_datetime64_any_dtype(series)
+
+
+def _is_range(series):
+    return (pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)) or _is_datetime(series)
+
+
+# Values of a numeric or datetime column as float64 (datetimes in ns since the epoch), NaN for missing
+def _as_float(series):
+    if _is_datetime(series):
+        if getattr(series.dtype, "tz", None) is not None:
+            series = series.dt.tz_localize(None)
+        values = series.to_numpy(dtype="datetime64[ns]")
+        out = values.view(np.int64).astype(np.float64)
+        out[np.isnat(values)] = np.nan
+        return out
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+# "range", "categorical" or None (not filterable) for one column and its profile entry.
+# The category cap applies to category dtypes too, so a compacted text column isn't a huge multiselect.
+def _filter_kind(series, info):
+    if pd.api.types.is_bool_dtype(series):
+        return "categorical"
+    if info["kind"] in ("numeric", "datetime") and _is_range(series):
+        return "range"
+    if (info["distinct"] or 0) <= MAX_FILTER_CATEGORIES:
+        return "categorical"
+    return None
+
+
+# Row indexes of one dataset, built lazily per column and reused by every filter change:
+#   numeric/datetime  positions sorted by value, so a range is two binary searches
+#   categorical       positions grouped by category code, so a selection is a few slices
+# The frame is held weakly, so an index never keeps a dataset the shared store has evicted alive.
+class DatasetIndex:
+    def __init__(self, df, key=None):
+        self._frame = weakref.ref(df)
+        self.key = key
+        self.rows = len(df)
+        self._kinds = None
+        self._sorted = {}
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def df(self):
+        df = self._frame()
+        if df is None:
+            raise ReferenceError("The indexed dataset is no longer loaded.")
+        return df
+
+    def alive(self):
+        return self._frame() is not None
+
+    # Filter kind of every column, decided once from the dataset profile
+    def kinds(self):
+        with self._lock:
+            if self._kinds is None:
+                profile = profile_dataframe(self.df, self.key)["columns"]
+                self._kinds = {column: _filter_kind(self.df[column], profile[column]) for column in self.df.columns}
+            return self._kinds
+
+    def kind(self, column):
+        return self.kinds()[column]
+
+    def _sorted_index(self, column):
+        with self._lock:
+            if column not in self._sorted:
+                values = _as_float(self.df[column])
+                order = np.argsort(values, kind="stable")  # NaN sorts last
+                valid = int(np.count_nonzero(~np.isnan(values)))
+                self._sorted[column] = (order[:valid], values[order[:valid]])
+            return self._sorted[column]
+
+    def _code_index(self, column):
+        with self._lock:
+            if column not in self._codes:
+                codes, uniques = pd.factorize(self.df[column], sort=True)
+                order = np.argsort(codes, kind="stable")
+                bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                self._codes[column] = (list(uniques), order, bounds)
+            return self._codes[column]
+
+    # (low, high) of a numeric column, or of a datetime column as Timestamps
+    def bounds(self, column):
+        _, values = self._sorted_index(column)
+        if not len(values):
+            return None
+        low, high = values[0], values[-1]
+        if _is_datetime(self.df[column]):
+            return pd.Timestamp(int(low)), pd.Timestamp(int(high))
+        return low, high
+
+    def categories(self, column):
+        return self._code_index(column)[0]
+
+    # Row positions with low <= value <= high
+    def range_positions(self, column, low, high):
+        order, values = self._sorted_index(column)
+        if _is_datetime(self.df[column]):
+            low, high = pd.Timestamp(low).as_unit("ns").value, pd.Timestamp(high).as_unit("ns").value
+        start = np.searchsorted(values, low, side="left")
+        end = np.searchsorted(values, high, side="right")
+        return order[start:end]
+
+    # Row positions whose value is one of `selected`
+    def category_positions(self, column, selected):
+        uniques, order, bounds = self._code_index(column)
+        wanted = set(selected)
+        parts = [order[bounds[code]:bounds[code + 1]] for code, value in enumerate(uniques) if value in wanted]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    # Sorted row positions matching every filter: ("range", column, low, high) or ("in", column, values)
+    def select(self, filters):
+        mask = None
+        for kind, column, *args in filters:
+            positions = self.range_positions(column, *args) if kind == "range" else self.category_positions(column, *args)
+            if len(positions) == self.rows:
+                continue
+            hit = np.zeros(self.rows, dtype=bool)
+            hit[positions] = True
+            mask = hit if mask is None else mask & hit
+        return None if mask is None else np.flatnonzero(mask)
+
+
+# Index of a dataset, shared by reruns and sessions that load the same contents.
+# Indexes whose frame has been freed are dropped instead of being reused.
+def dataset_index(df, key=None):
+    key = key or dataset_fingerprint(df)
+    with _memo_lock:
+        index = _memo.get(key)
+        if index is not None and index.alive():
+            _memo.move_to_end(key)
+            return index
+    index = DatasetIndex(df, key)
+    with _memo_lock:
+        _memo[key] = index
+        _memo.move_to_end(key)
+        for stale in [k for k, i in _memo.items() if not i.alive()]:
+            del _memo[stale]
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+    return index
+
+
+# Rows of df matching the filters (df itself when nothing is filtered out)
+def apply_filters(df, filters, key=None):
+    if not filters:
+        return df
+    positions = dataset_index(df, key).select(filters)
+    return df if positions is None else df.iloc[positions]
@@ -0,0 +1,125 @@
+import collections
+import threading
+
+import numpy as np
+import pandas as pd
+
+from profiler import dataset_fingerprint
+
+
+# Cell size in degrees of each resolution level; each level halves the one before it
+LEVEL_DEGREES = [8.0 / 2 ** level for level in range(8)]
+GRIDS = ["square", "hex"]
+
+_MEMO_SIZE = 8
+_memo = collections.OrderedDict()
+_memo_lock = threading.Lock()
+
+
+# Valid lat/lon pairs as float arrays; longitudes are wrapped into [-180, 180)
+def _coordinates(df, lat, lon):
+    lats = pd.to_numeric(df[lat], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    lons = pd.to_numeric(df[lon], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(lats) & ~np.isnan(lons) & (np.abs(lats) <= 90)
+    lons = (lons[valid] + 180.0) % 360.0 - 180.0
+    return lats[valid], lons
+
+
+def _counts(ids):
+    cells, counts = np.unique(ids, return_counts=True)
+    return cells, counts
+
+
+# Point counts per grid cell at every resolution level of one lat/lon point set.
+# The square grid is binned once at the finest level; coarser levels are rolled up from those
+# cells (a parent cell holds exactly four children), so each level costs only the cell count.
+class GeoPyramid:
+    def __init__(self, lats, lons):
+        self.points = len(lats)
+        self._lats = lats
+        self._lons = lons
+        self._levels = {}
+        self._lock = threading.Lock()
+        finest = LEVEL_DEGREES[-1]
+        ix = np.floor((lons + 180.0) / finest).astype(np.int64)
+        iy = np.floor((lats + 90.0) / finest).astype(np.int64)
+        self._finest = _counts(ix * (1 << 20) + iy)
+
+    def _square(self, level):
+        shift = len(LEVEL_DEGREES) - 1 - level
+        cells, counts = self._finest
+        ix, iy = cells >> 20, cells & ((1 << 20) - 1)
+        parents, inverse = np.unique((ix >> shift) * (1 << 20) + (iy >> shift), return_inverse=True)
+        totals = np.bincount(inverse, weights=counts).astype(np.int64)
+        size = LEVEL_DEGREES[level]
+        lon = ((parents >> 20) + 0.5) * size - 180.0
+        lat = ((parents & ((1 << 20) - 1)) + 0.5) * size - 90.0
+        return pd.DataFrame({"lat": np.clip(lat, -90, 90), "lon": lon, "count": totals})
+
+    # Hexagons in the lat/lon plane: two offset rectangular lattices, each point goes to the
+    # nearer centre (the hexbin construction). Hex levels don't nest, so each is binned from the points.
+    def _hex(self, level):
+        width = LEVEL_DEGREES[level]
+        height = width * np.sqrt(3)
+        u = (self._lons + 180.0) / width
+        v = (self._lats + 90.0) / height
+        ix1, iy1 = np.round(u), np.round(v)
+        ix2, iy2 = np.floor(u), np.floor(v)
+        d1 = (u - ix1) ** 2 + 3 * (v - iy1) ** 2
+        d2 = (u - ix2 - 0.5) ** 2 + 3 * (v - iy2 - 0.5) ** 2
+        first = d1 <= d2
+        ix = np.where(first, ix1, ix2).astype(np.int64)
+        iy = np.where(first, iy1, iy2).astype(np.int64)
+        cells, counts = _counts((ix * (1 << 20) + iy) * 2 + (~first))
+        offset = (cells & 1) * 0.5
+        lon = ((cells >> 21) + offset) * width - 180.0
+        lat = (((cells >> 1) & ((1 << 20) - 1)) + offset) * height - 90.0
+        return pd.DataFrame({"lat": np.clip(lat, -90, 90), "lon": lon, "count": counts})
+
+    def level(self, level, grid="square"):
+        with self._lock:
+            if (level, grid) not in self._levels:
+                self._levels[(level, grid)] = self._hex(level) if grid == "hex" else self._square(level)
+            return self._levels[(level, grid)]
+
+    # Finest level with at most max_cells cells (a square level has at most 4x the cells of the one above)
+    def auto_level(self, max_cells, grid="square"):
+        best = 0
+        for level in range(len(LEVEL_DEGREES)):
+            if len(self.level(level, grid)) > max_cells:
+                break
+            best = level
+        return best
+
+
+def clear_memo():
+    with _memo_lock:
+        _memo.clear()
+
+
+# Pyramid of a frame's lat/lon columns, shared by reruns and sessions viewing the same data
+def geo_pyramid(df, lat, lon):
+    key = (dataset_fingerprint(df), str(lat), str(lon))
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    pyramid = GeoPyramid(*_coordinates(df, lat, lon))
+    with _memo_lock:
+        _memo[key] = pyramid
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+    return pyramid
+
+
+# One row per location for choropleths: numeric values are reduced with `how` (one of
+# aggregation.AGGREGATIONS; the mean suits rates repeated per year as well as plain measures),
+# anything else keeps the most frequent value, so the browser never has to resolve duplicate locations
+def location_values(df, locations, value, how="mean"):
+    frame = df[[locations] if value in (None, locations) else [locations, value]].dropna(subset=[locations])
+    if value in (None, locations):
+        return frame.groupby(locations, observed=True).size().rename("count").reset_index(), "count"
+    grouped = frame.groupby(locations, observed=True, sort=True)[value]
+    if pd.api.types.is_numeric_dtype(frame[value]) and not pd.api.types.is_bool_dtype(frame[value]):
+        return grouped.agg(how).reset_index(), value
+    return grouped.agg(lambda values: values.mode().iat[0] if values.notna().any() else None).reset_index(), value
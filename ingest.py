@@ -0,0 +1,731 @@
+import codecs
+import collections
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import columnar as columnar_store
+from cache import dataset_cache
+from compaction import compact_dataframe
+from instrumentation import span
+
+
+# Network limits, overridable from the environment
+CONNECT_TIMEOUT = float(os.environ.get("VISBOT_HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("VISBOT_HTTP_READ_TIMEOUT", "60"))
+DOWNLOAD_DEADLINE = float(os.environ.get("VISBOT_HTTP_DEADLINE", "600"))
+MAX_DOWNLOAD_BYTES = int(os.environ.get("VISBOT_HTTP_MAX_MB", "500")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+# Sources without ETag/Last-Modified can't be revalidated, so they're only trusted this long
+UNVALIDATED_TTL = 300
+# A download (or revalidation) younger than this is reused without contacting the server,
+# so Streamlit reruns don't pay a round trip
+FRESH_SECONDS = float(os.environ.get("VISBOT_HTTP_FRESH_SECONDS", "60"))
+
+JSON_TYPES = ("application/json", "text/json", "application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+JSON_EXTENSIONS = (".json", ".ndjson", ".jsonl")
+CSV_TYPES = ("text/csv", "application/csv", "text/plain")
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class FetchError(ValueError):
+    pass
+
+
+class DownloadTooLarge(FetchError):
+    pass
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# (url, variant) -> (etag, last_modified, cache key, fetched_at) of the last successful download,
+# kept for the most recently used URLs only
+MAX_VALIDATORS = 1024
+_validators = collections.OrderedDict()
+_validators_lock = threading.Lock()
+
+
+# Shared, connection-pooled HTTP session; requests is imported on the first download
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=2)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "VisBot"
+            _session = session
+        return _session
+
+
+# File-like view over a streamed response body that enforces size and time limits
+class _ResponseReader(io.RawIOBase):
+    def __init__(self, response, max_bytes, deadline):
+        self._chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        self._buffer = b""
+        self._max_bytes = max_bytes
+        self._deadline = deadline
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            if time.monotonic() > self._deadline:
+                raise FetchError("Download timed out.")
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                return 0
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self._max_bytes:
+                raise DownloadTooLarge(f"Download exceeds the limit of {self._max_bytes} bytes.")
+            self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _get_validators(url, variant):
+    with _validators_lock:
+        previous = _validators.get((url, variant))
+        if previous is not None:
+            _validators.move_to_end((url, variant))
+        return previous
+
+
+# Remember (or with value=None forget) the validators of a download, dropping the least recently used
+def _set_validators(url, variant, value):
+    with _validators_lock:
+        if value is None:
+            _validators.pop((url, variant), None)
+            return
+        _validators[(url, variant)] = value
+        _validators.move_to_end((url, variant))
+        while len(_validators) > MAX_VALIDATORS:
+            _validators.popitem(last=False)
+
+
+# Pick a parser from the Content-Type header, falling back on the URL extension
+def detect_format(content_type, url):
+    content_type = (content_type or "").lower()
+    path = url.split("?", 1)[0].lower()
+    if any(t in content_type for t in JSON_TYPES) or path.endswith(JSON_EXTENSIONS):
+        return "json"
+    if XLSX_TYPE in content_type or path.endswith(".xlsx"):
+        return "xlsx"
+    if any(t in content_type for t in CSV_TYPES) or path.endswith(".csv"):
+        return "csv"
+    return None
+
+
+# Same rule read_data applies to uploads: ';' in the header line means ';'-separated
+def sniff_delimiter(first_line):
+    return ';' if ';' in first_line else ','
+
+
+# Parse a buffered binary stream according to its format
+def parse_stream(stream, fmt, csv_options=None, total_bytes=None, progress=None, excel_options=None):
+    if fmt == "csv" and csv_options:
+        return read_csv_chunked(stream, total_bytes=total_bytes, progress=progress, **csv_options)
+    if fmt == "csv":
+        first_line = stream.peek(64 * 1024).split(b"\n", 1)[0].decode("utf-8", errors="replace")
+        return pd.read_csv(stream, delimiter=sniff_delimiter(first_line))
+    if fmt == "json":
+        return read_json_stream(stream, total_bytes=total_bytes, progress=progress)
+    if fmt == "xlsx":
+        # openpyxl needs random access, so the workbook is buffered once in memory
+        workbook = io.BytesIO(stream.read())
+        if excel_options:
+            return read_excel_fast(workbook, **excel_options)
+        return pd.read_excel(workbook)
+    raise FetchError("File format not supported or content could not be identified.")
+
+
+# Read a local file by its extension, with the same delimiter sniffing as uploads
+def read_path(path, csv_options=None, excel_options=None):
+    fmt = detect_format(None, path)
+    if fmt is None:
+        raise ValueError("Unsupported file format.")
+    if fmt == "xlsx" and excel_options:
+        with span("parse", format=fmt):
+            return read_excel_fast(path, **excel_options)
+    with open(path, "rb") as stream, span("parse", format=fmt):
+        return parse_stream(stream, fmt, csv_options=csv_options, total_bytes=os.path.getsize(path))
+
+
+# Cached frame of a previous download, reopening its Arrow copy if the memory tier dropped it
+def _cached_frame(key, cache, columnar):
+    df = cache.get(key)
+    if df is None and columnar:
+        df = columnar_store.reopen(key)
+        if df is not None:
+            cache.put(key, df)
+    if df is not None and columnar and not columnar_store.has(key):
+        columnar_store.materialize(key, df)
+    return df
+
+
+def _cache_key(url, etag, last_modified, variant):
+    digest = hashlib.sha256(f"{url}|{variant!r}".encode("utf-8"))
+    digest.update(f"ETag:{etag}|Last-Modified:{last_modified}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Download a URL exactly once, streaming the body straight into the parser.
+# Unchanged sources are revalidated with a conditional GET (at most every FRESH_SECONDS) and
+# served from the dataset cache, which also covers for a server that is down or failing.
+def read_url(url, max_bytes=MAX_DOWNLOAD_BYTES, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), deadline=DOWNLOAD_DEADLINE,
+             cache=None, csv_options=None, progress=None, columnar=False, excel_options=None, compact=False):
+    import requests
+
+    cache = cache or dataset_cache
+    headers = {}
+    variant = repr((csv_options, excel_options, compact)) if (csv_options or excel_options or compact) else None
+    previous = _get_validators(url, variant)
+    if previous is not None:
+        etag, last_modified, key, fetched_at = previous
+        if time.time() - fetched_at < FRESH_SECONDS:
+            df = _cached_frame(key, cache, columnar)
+            if df is not None:
+                return df
+        if etag or last_modified:
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        else:
+            df = cache.get(key)
+            if df is not None:
+                return df
+
+    try:
+        with span("fetch", conditional=bool(headers)) as fetch_span:
+            response = get_session().get(url, headers=headers, stream=True, timeout=timeout)
+            fetch_span["status"] = response.status_code
+    except requests.RequestException as e:
+        df = _cached_frame(previous[2], cache, columnar) if previous is not None else None
+        if df is not None:
+            return df
+        raise FetchError(f"Could not download {url}: {e}") from e
+
+    with response:
+        if (response.status_code == 304 or response.status_code >= 500) and previous is not None:
+            df = _cached_frame(previous[2], cache, columnar)
+            if df is not None:
+                if response.status_code == 304:
+                    _set_validators(url, variant, previous[:3] + (time.time(),))
+                return df
+            # The cached frame was evicted; fetch the body again without validators
+            _set_validators(url, variant, None)
+            return read_url(url, max_bytes=max_bytes, timeout=timeout, deadline=deadline, cache=cache,
+                            csv_options=csv_options, progress=progress, columnar=columnar, excel_options=excel_options,
+                            compact=compact)
+        if response.status_code >= 400:
+            raise FetchError(f"Could not download {url}: HTTP {response.status_code}")
+
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise DownloadTooLarge(f"Download exceeds the limit of {max_bytes} bytes.")
+
+        fmt = detect_format(response.headers.get("Content-Type"), url)
+        if fmt is None:
+            raise FetchError("File format not supported or content could not be identified.")
+
+        reader = _ResponseReader(response, max_bytes, time.monotonic() + deadline)
+        stream = io.BufferedReader(reader, buffer_size=CHUNK_SIZE)
+        total_bytes = int(declared) if declared and declared.isdigit() else None
+        with span("parse", format=fmt) as parse_span:
+            df = parse_stream(stream, fmt, csv_options=csv_options, total_bytes=total_bytes, progress=progress,
+                              excel_options=excel_options)
+            parse_span["download_bytes"] = reader.bytes_read
+    if compact:
+        # Compacted before caching, so the frame held in memory is the small one
+        with span("compact") as compact_span:
+            df, report = compact_dataframe(df)
+            compact_span["frame_bytes"] = report["after_bytes"]
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    key = _cache_key(url, etag, last_modified, variant)
+    if columnar and (etag or last_modified) and columnar_store.materialize(key, df):
+        df = columnar_store.reopen(key)
+    cache.put(key, df, ttl=None if (etag or last_modified) else UNVALIDATED_TTL)
+    _set_validators(url, variant, (etag, last_modified, key, time.time()))
+    return df
+
+
+# Defaults for the chunked, memory-bounded CSV mode
+CSV_CHUNK_ROWS = 200_000
+CSV_SAMPLE_ROWS = 10_000
+CSV_MEMORY_LIMIT = int(os.environ.get("VISBOT_CSV_MEMORY_MB", "256")) * 1024 * 1024
+
+
+# Read the first line of a binary/text stream without consuming it
+def peek_first_line(stream):
+    if hasattr(stream, "peek"):
+        head = stream.peek(64 * 1024)
+    else:
+        position = stream.tell()
+        head = stream.readline()
+        stream.seek(position)
+    if isinstance(head, bytes):
+        head = head.decode("utf-8", errors="replace")
+    return head.split("\n", 1)[0]
+
+
+# Column names of a CSV, read from its header line only
+def read_csv_columns(stream):
+    first_line = peek_first_line(stream)
+    return list(pd.read_csv(io.StringIO(first_line), delimiter=sniff_delimiter(first_line), nrows=0).columns)
+
+
+# Dtypes inferred from a small sample, widened so later chunks can't overflow them
+def infer_csv_dtypes(sample):
+    dtypes = {}
+    for column in sample.columns:
+        series = sample[column]
+        if pd.api.types.is_bool_dtype(series):
+            dtypes[column] = "boolean"
+        elif pd.api.types.is_numeric_dtype(series):
+            dtypes[column] = "float64"
+        elif series.nunique(dropna=True) <= max(50, len(series) // 100):
+            dtypes[column] = "category"
+    return dtypes
+
+
+# Merge per-chunk partial aggregates into a single frame
+def _combine_partials(partials, group_by):
+    combined = pd.concat(partials)
+    sums = combined.filter(like="__sum").groupby(level=list(range(len(group_by)))).sum()
+    counts = combined.filter(like="__count").groupby(level=list(range(len(group_by)))).sum()
+    mins = combined.filter(like="__min").groupby(level=list(range(len(group_by)))).min()
+    maxs = combined.filter(like="__max").groupby(level=list(range(len(group_by)))).max()
+    return pd.concat([sums, counts, mins, maxs], axis=1)
+
+
+# Read a CSV in chunks while staying under a memory ceiling.
+# mode="sample" keeps every row if they fit, otherwise a uniform reservoir sample;
+# mode="aggregate" pre-aggregates value_columns per group_by keys chunk by chunk.
+# progress(rows_read, fraction) is called after every chunk; fraction is None if the size is unknown.
+def read_csv_chunked(stream, usecols=None, mode="sample", memory_limit=CSV_MEMORY_LIMIT,
+                     chunk_rows=CSV_CHUNK_ROWS, sample_rows=CSV_SAMPLE_ROWS,
+                     group_by=None, value_columns=None, total_bytes=None, progress=None, seed=0):
+    delimiter = sniff_delimiter(peek_first_line(stream))
+    if mode == "aggregate":
+        if not group_by:
+            raise ValueError("Aggregate mode needs at least one group-by column.")
+        value_columns = list(value_columns or [])
+        usecols = list(dict.fromkeys(list(group_by) + value_columns))
+
+    reader = pd.read_csv(stream, delimiter=delimiter, usecols=usecols, chunksize=chunk_rows, low_memory=True)
+    rng = np.random.default_rng(seed)
+    dtypes = None
+    capacity = None
+    reservoir = None
+    partials = []
+    rows_read = 0
+
+    for chunk in reader:
+        chunk_rows_read = len(chunk)
+        if dtypes is None:
+            dtypes = infer_csv_dtypes(chunk.head(sample_rows))
+            sample = chunk.head(sample_rows).astype(dtypes)
+            bytes_per_row = max(1.0, sample.memory_usage(deep=True).sum() / max(1, len(sample)))
+            capacity = max(1, int(memory_limit // bytes_per_row))
+        try:
+            chunk = chunk.astype(dtypes)
+        except (ValueError, TypeError):
+            # A later chunk broke the sampled types; keep this chunk's own inference
+            pass
+
+        if mode == "aggregate":
+            grouped = chunk.groupby(list(group_by), observed=True, dropna=False)
+            numeric = [c for c in value_columns if pd.api.types.is_numeric_dtype(chunk[c])]
+            parts = [grouped.size().rename("rows__count")]
+            for column in numeric:
+                parts += [
+                    grouped[column].sum().rename(f"{column}__sum"),
+                    grouped[column].count().rename(f"{column}__count"),
+                    grouped[column].min().rename(f"{column}__min"),
+                    grouped[column].max().rename(f"{column}__max"),
+                ]
+            partials.append(pd.concat(parts, axis=1))
+            # Keep the partials list bounded by folding it as it grows
+            if len(partials) >= 16:
+                partials = [_combine_partials(partials, group_by)]
+        else:
+            chunk = chunk.reset_index(drop=True)
+            start = rows_read
+            filled = 0 if reservoir is None else len(reservoir)
+            if filled < capacity:
+                head = chunk.iloc[:capacity - filled]
+                reservoir = head if reservoir is None else pd.concat([reservoir, head], ignore_index=True)
+                chunk = chunk.iloc[len(head):]
+                start += len(head)
+            if len(chunk):
+                # Algorithm R, vectorised: row i replaces slot j ~ U[0, i] when j < capacity
+                slots = rng.integers(0, np.arange(start, start + len(chunk)) + 1)
+                keep = slots < capacity
+                if keep.any():
+                    picks = pd.Series(np.flatnonzero(keep), index=slots[keep])
+                    picks = picks[~picks.index.duplicated(keep="last")]
+                    reservoir = pd.concat(
+                        [reservoir.drop(index=picks.index), chunk.iloc[picks.to_numpy()]],
+                        ignore_index=True,
+                    )
+
+        rows_read += chunk_rows_read
+        if progress is not None:
+            fraction = None
+            if total_bytes and hasattr(stream, "tell"):
+                try:
+                    fraction = min(1.0, stream.tell() / total_bytes)
+                except (OSError, ValueError):
+                    fraction = None
+            progress(rows_read, fraction)
+
+    if mode == "aggregate":
+        df = _combine_partials(partials, group_by).reset_index() if partials else pd.DataFrame(columns=usecols)
+        for column in value_columns:
+            if f"{column}__sum" in df:
+                df[f"{column}__mean"] = df[f"{column}__sum"] / df[f"{column}__count"]
+        df.attrs["aggregated"] = True
+    else:
+        df = reservoir if reservoir is not None else pd.DataFrame(columns=usecols)
+        if dtypes:
+            try:
+                df = df.astype(dtypes)
+            except (ValueError, TypeError):
+                pass
+        df.attrs["sampled"] = rows_read > len(df)
+    df.attrs["source_rows"] = rows_read
+    return df
+
+
+# Excel engines read_excel_fast can use; calamine (Rust) is much faster when installed
+EXCEL_ENGINES = ["auto", "openpyxl", "calamine"]
+
+
+def calamine_available():
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+# Sheet names with their size and header row, read without loading any cell data
+def excel_sheets(source):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            sheets.append({
+                "name": sheet.title,
+                "rows": sheet.max_row,
+                "columns": [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)],
+            })
+        return sheets
+    finally:
+        workbook.close()
+        if hasattr(source, "seek"):
+            source.seek(0)
+
+
+# Read one sheet of a workbook, parsing only the selected columns and row range.
+# skip_rows counts data rows after the header; nrows=None reads to the end.
+def read_excel_fast(source, sheet=None, usecols=None, skip_rows=0, nrows=None, engine="auto"):
+    if engine == "auto":
+        engine = "calamine" if calamine_available() else "openpyxl"
+    if engine == "calamine":
+        return pd.read_excel(
+            source, sheet_name=sheet or 0, usecols=usecols or None, engine="calamine",
+            skiprows=range(1, skip_rows + 1) if skip_rows else None, nrows=nrows,
+        )
+
+    import openpyxl
+
+    # read_only streams the sheet XML row by row instead of building the whole cell tree
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        header = next(worksheet.iter_rows(min_row=1, max_row=1, values_only=True), None)
+        if header is None:
+            return pd.DataFrame()
+        names = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        positions = [i for i, name in enumerate(names) if not usecols or name in usecols]
+        first_row = 2 + skip_rows
+        last_row = first_row + nrows - 1 if nrows else None
+        rows = [
+            [row[i] if i < len(row) else None for i in positions]
+            for row in worksheet.iter_rows(min_row=first_row, max_row=last_row, values_only=True)
+        ]
+    finally:
+        workbook.close()
+    return pd.DataFrame(rows, columns=[names[i] for i in positions]).infer_objects()
+
+
+# Streaming JSON: records are parsed in batches of JSON_BATCH_ROWS and nested objects are
+# flattened into dotted columns down to JSON_MAX_DEPTH levels (deeper values are kept as JSON text)
+JSON_BATCH_ROWS = 50_000
+JSON_MAX_DEPTH = int(os.environ.get("VISBOT_JSON_MAX_DEPTH", "3"))
+JSON_READ_BYTES = 1024 * 1024
+# Keys whose array of row lists is taken as the records of a wrapper object that names its
+# columns, e.g. {"columns": [...], "data": [[...], ...]} (arrays of objects are records under any key)
+JSON_WRAPPER_KEYS = ("data", "items", "results", "records", "rows", "features", "value", "hits", "entries")
+# A first line up to this long is tried as an NDJSON record
+NDJSON_PROBE_BYTES = 1024 * 1024
+
+
+# Incremental reader of JSON values from a binary stream. Only the unparsed tail of the
+# document is buffered; when a value is cut off, the buffer grows geometrically until it parses.
+class _JsonScanner:
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self._bytes = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self, size=JSON_READ_BYTES):
+        if self.eof:
+            return False
+        block = self.stream.read(max(size, JSON_READ_BYTES))
+        if not block:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self._bytes.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self._bytes.decode(block)
+        self.pos = 0
+        return True
+
+    # Next non-whitespace character ("" at the end of the document), without consuming it
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._read():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise FetchError(f"Invalid JSON: expected {char!r} at {self.buf[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the very end of the buffer may continue in the next block
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise FetchError(f"Invalid JSON: {e}") from e
+            self._read(len(self.buf) - self.pos)
+
+    # Elements of the array starting at the current position
+    def elements(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise FetchError("Invalid JSON: expected ',' or ']' in array")
+
+
+# True when the document starts with a complete one-line JSON value followed by another value
+def _looks_like_ndjson(stream):
+    if not hasattr(stream, "peek"):
+        position = stream.tell()
+        head = stream.read(NDJSON_PROBE_BYTES)
+        stream.seek(position)
+    else:
+        head = stream.peek(NDJSON_PROBE_BYTES)[:NDJSON_PROBE_BYTES]
+    lines = head.decode("utf-8-sig", errors="replace").lstrip().split("\n", 1)
+    if len(lines) < 2 or not lines[1].strip():
+        return False
+    try:
+        json.loads(lines[0])
+    except ValueError:
+        return False
+    return lines[1].lstrip()[:1] in ("{", "[")
+
+
+# Rows of a wrapper object's array as records keyed by its "columns" sibling
+def _named_rows(rows, columns):
+    for row in rows:
+        yield dict(zip(columns, row)) if isinstance(row, list) else row
+
+
+# Records of a wrapper object whose arrays were read whole: row lists under a wrapper key
+# named by a "columns" sibling, else the longest array of objects. None if there are none.
+def _buffered_records(document):
+    arrays = {key: value for key, value in document.items() if isinstance(value, list) and value}
+    columns = document.get("columns")
+    if isinstance(columns, list):
+        for key in JSON_WRAPPER_KEYS:
+            if key in arrays and isinstance(arrays[key][0], list):
+                return _named_rows(arrays[key], columns)
+    objects = [key for key, value in arrays.items() if isinstance(value[0], dict)]
+    if not objects:
+        return None
+    return arrays[max(objects, key=lambda key: len(arrays[key]))]
+
+
+# Records of a JSON document, whatever its shape: a top-level array, NDJSON / concatenated
+# values, or a wrapper object holding the records in one of its arrays. Arrays of objects (or of
+# row lists with a "columns" sibling) under a JSON_WRAPPER_KEYS key are streamed; other arrays
+# are read whole and, if no wrapper key holds the records, the longest array of objects is used,
+# so {"links": [{...}], "data": [{...}, ...]} yields the data. Documents with no records array
+# (e.g. {"column": {"row": value}} or {"time": [1, 2], "value": [3, 4]}) are returned whole as
+# the `fallback` list entry.
+def iter_json_records(stream, fallback):
+    ndjson = _looks_like_ndjson(stream)
+    scanner = _JsonScanner(stream)
+    first = scanner.peek()
+    if ndjson:
+        while scanner.peek():
+            yield scanner.value()
+        return
+    if first == "[":
+        yield from scanner.elements()
+        return
+    if first != "{":
+        fallback.append(scanner.value())
+        return
+
+    scanner.expect("{")
+    document, streamed = {}, False
+    while scanner.peek() != "}":
+        key = scanner.value()
+        scanner.expect(":")
+        if not streamed and scanner.peek() == "[":
+            elements = scanner.elements()
+            head = next(elements, None)
+            columns = document.get("columns")
+            if isinstance(head, dict) and key in JSON_WRAPPER_KEYS:
+                streamed = True
+                yield head
+                yield from elements
+            elif isinstance(head, list) and key in JSON_WRAPPER_KEYS and isinstance(columns, list):
+                streamed = True
+                yield from _named_rows(itertools.chain([head], elements), columns)
+            else:
+                document[key] = ([head] if head is not None else []) + list(elements)
+        else:
+            document[key] = scanner.value()
+        if scanner.peek() == ",":
+            scanner.pos += 1
+    scanner.pos += 1
+    if streamed:
+        return
+    if scanner.peek() in ("{", "["):
+        # Concatenated values whose first line was too long to probe: the object was a record
+        yield document
+        while scanner.peek():
+            yield scanner.value()
+        return
+    records = _buffered_records(document)
+    if records is None:
+        fallback.append(document)
+    else:
+        yield from records
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+# Expand dict-valued columns into dotted columns, one nesting level per pass (like
+# pd.json_normalize's max_level, which deep-copies every record and is far slower).
+# Values still holding dicts/lists below the depth limit become JSON text, so columns stay hashable.
+# Scalars sharing a column with dicts ([{"a": {"b": 1}}, {"a": 5}]) stay under the parent name.
+def _flatten_frame(frame, max_depth):
+    columns = {}
+    for column in frame.columns:
+        series = frame[column]
+        if series.dtype != object:
+            columns[column] = series
+            continue
+        values = series.tolist()
+        if max_depth > 0 and any(isinstance(v, dict) for v in values):
+            if any(not isinstance(v, dict) and not _is_missing(v) for v in values):
+                scalars = [None if isinstance(v, dict) else json.dumps(v) if isinstance(v, list) else v for v in values]
+                columns[column] = pd.Series(scalars, index=frame.index, dtype=object).infer_objects()
+            nested = pd.DataFrame([v if isinstance(v, dict) else {} for v in values], index=frame.index)
+            nested = _flatten_frame(nested, max_depth - 1)
+            for name in nested.columns:
+                columns[f"{column}.{name}"] = nested[name]
+        elif any(isinstance(v, (dict, list)) for v in values):
+            columns[column] = pd.Series([json.dumps(v) if isinstance(v, (dict, list)) else v for v in values], index=frame.index, dtype=object)
+        else:
+            columns[column] = series
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _flatten_batch(batch, max_depth):
+    if all(isinstance(record, dict) for record in batch):
+        return _flatten_frame(pd.DataFrame.from_records(batch), max_depth)
+    if all(isinstance(record, list) for record in batch):
+        return _flatten_frame(pd.DataFrame(batch), max_depth)
+    return _flatten_frame(pd.DataFrame({"value": batch}), max_depth)
+
+
+# Parse a JSON/NDJSON stream in batches, flattening nested records down to max_depth levels.
+# progress(rows_read, fraction) is called after every batch, like read_csv_chunked.
+def read_json_stream(stream, max_depth=JSON_MAX_DEPTH, batch_rows=JSON_BATCH_ROWS, total_bytes=None, progress=None):
+    fallback = []
+    frames, batch, rows_read = [], [], 0
+
+    def flush():
+        nonlocal batch, rows_read
+        frames.append(_flatten_batch(batch, max_depth))
+        rows_read += len(batch)
+        batch = []
+        if progress is not None:
+            fraction = None
+            if total_bytes and hasattr(stream, "tell"):
+                try:
+                    fraction = min(1.0, stream.tell() / total_bytes)
+                except (OSError, ValueError):
+                    fraction = None
+            progress(rows_read, fraction)
+
+    for record in iter_json_records(stream, fallback):
+        batch.append(record)
+        if len(batch) >= batch_rows:
+            flush()
+    if batch:
+        flush()
+    if fallback:
+        # Column-oriented documents keep pandas' own interpretation
+        return pd.read_json(io.StringIO(json.dumps(fallback[0])))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
@@ -0,0 +1,111 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+
+
+# Lightweight span recording for one Streamlit rerun (or one batch task).
+#
+#   run = start_run()
+#   with span("read_data") as s:
+#       df = ...
+#       s["frame_bytes"] = frame_bytes(df)
+#   run.spans  ->  [{"name": "read_data", "start": 0.0, "seconds": 1.2, "frame_bytes": ...}]
+#
+# Spans outside a run cost one context variable lookup and aren't recorded.
+
+_current = contextvars.ContextVar("visbot_run", default=None)
+
+# Process-wide totals per stage, exported in Prometheus text format
+_totals = collections.defaultdict(lambda: {"count": 0, "seconds": 0.0, "last": {}})
+_totals_lock = threading.Lock()
+
+# Numeric span attributes exported as gauges
+GAUGE_FIELDS = ("frame_bytes", "payload_bytes", "raw_payload_bytes", "rows", "cache_hits", "cache_misses")
+
+
+class Run:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = []
+
+    def add(self, entry):
+        self.spans.append(entry)
+        with _totals_lock:
+            totals = _totals[entry["name"]]
+            totals["count"] += 1
+            totals["seconds"] += entry.get("seconds", 0.0)
+            for field in GAUGE_FIELDS:
+                if isinstance(entry.get(field), (int, float)):
+                    totals["last"][field] = entry[field]
+
+    def to_jsonl(self):
+        return "".join(json.dumps({"run_started": self.wall_started, **entry}, default=str) + "\n" for entry in self.spans)
+
+
+# Begin recording a new run in the current context and return it
+def start_run():
+    run = Run()
+    _current.set(run)
+    return run
+
+
+# Time a block. The yielded dict can be filled with extra attributes (bytes, rows, hits...).
+@contextlib.contextmanager
+def span(name, **attrs):
+    run = _current.get()
+    entry = {"name": name, **attrs}
+    if run is None:
+        yield entry
+        return
+    started = time.perf_counter()
+    entry["start"] = started - run.started
+    try:
+        yield entry
+    finally:
+        entry["seconds"] = time.perf_counter() - started
+        run.add(entry)
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+# Totals of every stage seen by this process, in Prometheus text exposition format
+def to_prometheus():
+    with _totals_lock:
+        snapshot = {name: {"count": t["count"], "seconds": t["seconds"], "last": dict(t["last"])} for name, t in _totals.items()}
+    lines = [
+        "# HELP visbot_stage_seconds Wall time spent in each VisBot stage.",
+        "# TYPE visbot_stage_seconds summary",
+    ]
+    for name, totals in sorted(snapshot.items()):
+        lines.append(f'visbot_stage_seconds_sum{{stage="{_label(name)}"}} {totals["seconds"]:.6f}')
+        lines.append(f'visbot_stage_seconds_count{{stage="{_label(name)}"}} {totals["count"]}')
+    for field in GAUGE_FIELDS:
+        values = [(name, t["last"][field]) for name, t in sorted(snapshot.items()) if field in t["last"]]
+        if values:
+            lines.append(f"# HELP visbot_{field} Last {field.replace('_', ' ')} reported by each stage.")
+            lines.append(f"# TYPE visbot_{field} gauge")
+            for name, value in values:
+                lines.append(f'visbot_{field}{{stage="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+# Decorator form of span() for whole functions
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from profiler import profile_dataframe
+
 
 # Función principal de la app
 def main():
@@ -61,18 +63,8 @@ def main():
 
 # Función para analizar datos y categorizar las columnas del dataframe
 def analyze_data(df):
-    analysis = {}
-    for column in df.columns:
-        dtype = df[column].dtype
-        if pd.api.types.is_numeric_dtype(df[column]):
-            analysis[column] = 'numeric'
-        elif pd.api.types.is_categorical_dtype(df[column]) or df[column].nunique() < 10:
-            analysis[column] = 'categorical'
-        elif pd.api.types.is_datetime64_any_dtype(df[column]):
-            analysis[column] = 'datetime'
-        else:
-            analysis[column] = 'other'
-    return analysis
+    profile = profile_dataframe(df)
+    return {column: info["kind"] for column, info in profile["columns"].items()}
 
 
 
@@ -0,0 +1,151 @@
+import collections
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+# Columns with fewer distinct values than this are treated as categories (same rule the app always used)
+CATEGORY_THRESHOLD = 10
+
+# Above this many rows, distinct counts of text columns are estimated with HyperLogLog
+APPROX_DISTINCT_ROWS = 200_000
+HLL_PRECISION = 14
+
+_MEMO_SIZE = 64
+_memo = collections.OrderedDict()
+_memo_lock = threading.Lock()
+
+# id(frame) -> (weak reference, fingerprint) of every live frame fingerprinted so far
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def _row_hashes(df):
+    try:
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:
+        # Unhashable cells (lists, dicts) are hashed by their text
+        return pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+
+
+def _forget(frame_id):
+    with _fingerprints_lock:
+        _fingerprints.pop(frame_id, None)
+
+
+# Stable identifier of a DataFrame's contents: shape, schema and a hash of every value, so any
+# changed cell gives a new key. Loaded frames are never modified in place, so each frame object
+# is hashed once and later calls (profile, indexes, caches, shared store) reuse the result.
+def dataset_fingerprint(df):
+    with _fingerprints_lock:
+        entry = _fingerprints.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    digest = hashlib.sha256()
+    digest.update(repr(df.shape).encode("utf-8"))
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    if len(df):
+        digest.update(_row_hashes(df).tobytes())
+    fingerprint = digest.hexdigest()
+    frame_id = id(df)
+    with _fingerprints_lock:
+        _fingerprints[frame_id] = (weakref.ref(df, lambda _, frame_id=frame_id: _forget(frame_id)), fingerprint)
+    return fingerprint
+
+
+# HyperLogLog estimate of the number of distinct values behind a uint64 hash array
+def hll_distinct(hashes, precision=HLL_PRECISION):
+    m = 1 << precision
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    if hashes.size == 0:
+        return 0
+    registers = np.zeros(m, dtype=np.uint8)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainder = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    # Position of the leftmost 1-bit in the remaining 64 - precision bits
+    rank = 64 - np.floor(np.log2(remainder.astype(np.float64))).astype(np.int64)
+    np.maximum.at(registers, index, rank.astype(np.uint8))
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+    return int(round(estimate))
+
+
+# Distinct non-null values of one column; exact for small frames, HLL for large ones
+def _distinct(series):
+    values = series.dropna()
+    if len(values) <= APPROX_DISTINCT_ROWS:
+        return int(values.nunique()), False
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return hll_distinct(hashes), True
+
+
+# Profile every column of a frame in one vectorised pass per dtype group
+def _build_profile(df):
+    numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    datetimes = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    nulls = df.isna().sum()
+
+    ranges = {}
+    for group in (numeric, datetimes):
+        if group:
+            block = df[group]
+            mins, maxs = block.min(), block.max()
+            for column in group:
+                ranges[column] = (mins[column], maxs[column])
+
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        info = {
+            "dtype": series.dtype,
+            "nulls": int(nulls[column]),
+            "min": None,
+            "max": None,
+            "distinct": None,
+            "approximate": False,
+        }
+        if column in ranges:
+            info["min"], info["max"] = ranges[column]
+        if column in numeric:
+            info["kind"] = "numeric"
+        else:
+            info["distinct"], info["approximate"] = _distinct(series)
+            if isinstance(series.dtype, pd.CategoricalDtype) or info["distinct"] < CATEGORY_THRESHOLD:
+                info["kind"] = "categorical"
+            elif column in datetimes:
+                info["kind"] = "datetime"
+            else:
+                info["kind"] = "other"
+        columns[column] = info
+    return {"rows": int(df.shape[0]), "columns": columns}
+
+
+# Forget every memoised profile and fingerprint, e.g. so benchmarks measure cold runs
+def clear_memo():
+    with _memo_lock:
+        _memo.clear()
+    with _fingerprints_lock:
+        _fingerprints.clear()
+
+
+# Memoised dataset profile: {"rows": n, "columns": {name: {kind, dtype, min, max, nulls, distinct, approximate}}}
+# key is the frame's fingerprint when the caller already has it
+def profile_dataframe(df, key=None):
+    key = key or dataset_fingerprint(df)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    profile = _build_profile(df)
+    with _memo_lock:
+        _memo[key] = profile
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+    return profile
@@ -0,0 +1,222 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import timed
+from profiler import profile_dataframe
+from schema_summary import DESCRIPTION_TOKENS, estimate_tokens, summarize_schema
+
+
+# Bump whenever the system/user prompt changes so stale answers aren't served
+PROMPT_VERSION = "1"
+
+DEFAULT_DB_PATH = os.environ.get("VISBOT_RECOMMENDATION_DB") or os.path.join(tempfile.gettempdir(), "visbot_recommendations.sqlite")
+DEFAULT_TTL = int(os.environ.get("VISBOT_RECOMMENDATION_TTL", str(7 * 24 * 3600)))
+DEFAULT_MAX_BYTES = int(os.environ.get("VISBOT_RECOMMENDATION_CACHE_MB", "64")) * 1024 * 1024
+
+# Upper bound on one streamed answer before the job gives up
+RECOMMENDATION_TIMEOUT = float(os.environ.get("VISBOT_RECOMMENDATION_TIMEOUT", "90"))
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="visbot-recommendation")
+
+# Streaming jobs in progress by recommendation key, shared across sessions
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+# Text description of the dataset that is sent to the model.
+# Wide datasets whose column-by-column description exceeds `token_budget` get a compact,
+# grouped and ranked schema summary instead (see schema_summary.summarize_schema).
+@timed("describe_dataset")
+def describe_dataset(df, token_budget=DESCRIPTION_TOKENS):
+    profile = profile_dataframe(df)
+    description = f"The data set has {df.shape[0]} rows and {df.shape[1]} columns. "
+    for column, info in profile["columns"].items():
+        description += f"The '{column}' column is of type {info['dtype']}, "
+        if info["kind"] == "numeric":
+            description += f"and contains numerical values ranging from {info['min']} to {info['max']}. "
+        
+        elif info["kind"] == "categorical":
+            description += f"and contains {info['distinct']} unique categories. "
+
+        elif info["kind"] == "datetime":
+            description += f"and contains time data ranging from {info['min']} to {info['max']}. "
+    if estimate_tokens(description) > token_budget:
+        return summarize_schema(profile, token_budget)
+    return description
+
+
+# Chat messages asking the model for visualization ideas
+def recommendation_messages(description):
+    return [
+        {"role": "system", "content": "You are an expert assistant in data analysis specialized in visualization."},
+        {"role": "user", "content": f"I have a data set. {description} What type of visualizations would you recommend from this data? Describe and if possible recommend options"}
+    ]
+
+
+# Fingerprint of everything that determines the model's answer
+def recommendation_key(description, model, prompt_version=PROMPT_VERSION):
+    digest = hashlib.sha256()
+    for part in (prompt_version, model, description):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# Disk-backed (SQLite) cache of recommendation texts, shared by every session and process
+class RecommendationCache:
+    def __init__(self, path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, model TEXT,"
+                " created_at REAL NOT NULL, used_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+
+    # One short-lived connection per operation, committed (or rolled back) and closed on exit
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM recommendations WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and row[1] + self.ttl < now):
+                if row is not None:
+                    conn.execute("DELETE FROM recommendations WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE recommendations SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value, model=None):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recommendations (key, value, model, created_at, used_at, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, model, now, now, size),
+            )
+            if self.ttl:
+                conn.execute("DELETE FROM recommendations WHERE created_at < ?", (now - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM recommendations").fetchone()[0]
+            if total > self.max_bytes:
+                # Evict least recently used answers until the budget holds again
+                rows = conn.execute("SELECT key, size FROM recommendations ORDER BY used_at").fetchall()
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM recommendations WHERE key = ?", (old_key,))
+                    total -= old_size
+
+    def invalidate(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM recommendations WHERE key = ?", (key,))
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM recommendations").fetchone()
+        return {"entries": entries, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+
+recommendation_cache = RecommendationCache()
+
+
+# Return a cached answer for (description, model), calling fetch() only on a miss or when refresh is set.
+# With a dispatcher, identical concurrent fetches are coalesced, rate limited and retried.
+def cached_recommendation(description, model, fetch, refresh=False, cache=None, dispatcher=None):
+    cache = cache or recommendation_cache
+    key = recommendation_key(description, model)
+    if not refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    answer = dispatcher.call(key, fetch) if dispatcher is not None else fetch()
+    cache.put(key, answer, model=model)
+    return answer
+
+
+# A recommendation being streamed on a background thread. The Streamlit script polls text/done
+# from the main thread, so the chart never waits on the model. Sessions asking for the same
+# key while it streams share the job; it is only cancelled once every subscriber cancels.
+class RecommendationJob:
+    def __init__(self, key, timeout=RECOMMENDATION_TIMEOUT):
+        self.key = key
+        self.deadline = time.monotonic() + timeout
+        self.error = None
+        self.subscribers = 1
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self._chunks = []
+        self._lock = threading.Lock()
+
+    @property
+    def text(self):
+        with self._lock:
+            return "".join(self._chunks)
+
+    def cancel(self):
+        with _jobs_lock:
+            self.subscribers -= 1
+            if self.subscribers > 0:
+                return
+        self.cancelled.set()
+
+    def _run(self, stream_tokens, model, cache):
+        tokens = None
+        try:
+            tokens = stream_tokens()
+            for token in tokens:
+                if self.cancelled.is_set():
+                    return
+                if time.monotonic() > self.deadline:
+                    raise TimeoutError("The AI recommendation took too long and was abandoned.")
+                with self._lock:
+                    self._chunks.append(token)
+            cache.put(self.key, self.text, model=model)
+        except Exception as e:
+            self.error = e
+        finally:
+            close = getattr(tokens, "close", None)
+            if close is not None:
+                close()
+            with _jobs_lock:
+                if _jobs.get(self.key) is self:
+                    del _jobs[self.key]
+            self.done.set()
+
+
+# Start streaming an answer in the background, or join the job already streaming it.
+# stream_tokens() must return an iterable of text fragments.
+def start_recommendation(description, model, stream_tokens, cache=None, timeout=RECOMMENDATION_TIMEOUT):
+    cache = cache or recommendation_cache
+    key = recommendation_key(description, model)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and not job.done.is_set() and not job.cancelled.is_set():
+            job.subscribers += 1
+            return job
+        job = _jobs[key] = RecommendationJob(key, timeout=timeout)
+    _executor.submit(job._run, stream_tokens, model, cache)
+    return job
@@ -0,0 +1,134 @@
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Token budget of the dataset description sent to the model
+DESCRIPTION_TOKENS = int(os.environ.get("VISBOT_DESCRIPTION_TOKENS", "1500"))
+
+# Columns sharing a name pattern (digits masked) and kind collapse into one entry from this many
+MIN_GROUP_SIZE = 3
+
+_DIGITS = re.compile(r"\d+")
+
+
+# Rough token count for OpenAI-style tokenizers (about 4 characters per token for English and identifiers)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _fmt(value):
+    if isinstance(value, (float, np.floating)):
+        return f"{float(value):.4g}"
+    return str(value)
+
+
+def _pattern(name):
+    return _DIGITS.sub("#", str(name))
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", str(name))]
+
+
+# How much a column tells the model about possible charts: constant, mostly-null and
+# ID-like columns rank last; low-cardinality categories, dates and varying numbers first
+def informativeness(info, rows):
+    if rows == 0:
+        return 0.0
+    filled = 1 - info["nulls"] / rows
+    kind = info["kind"]
+    if kind == "numeric":
+        score = 0.0 if info["min"] == info["max"] else 2.0
+    elif kind == "datetime":
+        score = 0.0 if info["min"] == info["max"] else 3.0
+    elif kind == "categorical":
+        distinct = info["distinct"] or 0
+        score = 0.0 if distinct <= 1 else 3.0 if distinct <= 50 else 1.5
+    else:
+        # Free text or identifiers: close to one value per row is useless for grouping
+        score = 0.5 if (info["distinct"] or 0) < 0.5 * rows else 0.1
+    return score * filled
+
+
+# One entry per column, with columns that differ only by their digits merged into a group
+def _entries(profile):
+    groups = {}
+    for column, info in profile["columns"].items():
+        groups.setdefault((_pattern(column), info["kind"]), []).append((column, info))
+    entries = []
+    for (pattern, kind), members in groups.items():
+        if len(members) >= MIN_GROUP_SIZE and pattern != str(members[0][0]):
+            entries.append(_group_entry(kind, sorted(members, key=lambda m: _natural_key(m[0])), profile["rows"]))
+        else:
+            entries.extend(_column_entry(column, info, profile["rows"]) for column, info in members)
+    entries.sort(key=lambda entry: -entry["score"])
+    return entries
+
+
+def _column_entry(column, info, rows):
+    text = f"'{column}' ({info['dtype']}"
+    if info["kind"] == "numeric":
+        text += f", numeric {_fmt(info['min'])} to {_fmt(info['max'])}"
+    elif info["kind"] == "categorical":
+        text += f", {info['distinct']} categories"
+    elif info["kind"] == "datetime":
+        text += f", time {info['min']} to {info['max']}"
+    else:
+        text += f", {info['distinct']} distinct values"
+    if info["nulls"]:
+        text += f", {info['nulls'] / rows:.0%} missing"
+    return {"text": text + ")", "score": informativeness(info, rows), "columns": 1, "kind": info["kind"]}
+
+
+def _group_entry(kind, members, rows):
+    infos = [info for _, info in members]
+    text = f"{len(members)} {kind} columns '{members[0][0]}'..'{members[-1][0]}'"
+    if kind in ("numeric", "datetime"):
+        lows = [i["min"] for i in infos if i["min"] is not None and not pd.isna(i["min"])]
+        highs = [i["max"] for i in infos if i["max"] is not None and not pd.isna(i["max"])]
+        if lows and highs:
+            text += f" ({_fmt(min(lows))} to {_fmt(max(highs))})"
+    elif kind in ("categorical", "other"):
+        distinct = [i["distinct"] or 0 for i in infos]
+        spread = f"{min(distinct)}" if min(distinct) == max(distinct) else f"{min(distinct)}-{max(distinct)}"
+        text += f" ({spread} distinct values each)"
+    # A large family says a bit more than one column, but shouldn't outrank a good date or category
+    score = max(informativeness(info, rows) for info in infos) + 0.25 * math.log10(len(members))
+    return {"text": text, "score": score, "columns": len(members), "kind": kind}
+
+
+# Description of a dataset profile that fits in `budget` tokens, however many columns there are.
+# Columns are grouped by name pattern and kind, ranked by informativeness and listed until the
+# budget runs out; whatever doesn't fit is summarized as counts per kind.
+def summarize_schema(profile, budget=DESCRIPTION_TOKENS):
+    kinds = {}
+    for info in profile["columns"].values():
+        kinds[info["kind"]] = kinds.get(info["kind"], 0) + 1
+    header = (
+        f"The data set has {profile['rows']} rows and {len(profile['columns'])} columns ("
+        + ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items(), key=lambda item: -item[1]))
+        + "). Most informative columns: "
+    )
+    listed = []
+    used = estimate_tokens(header)
+    omitted = {}
+    # Reserve room for the closing sentence about omitted columns
+    reserve = estimate_tokens(" Also 99999 less informative columns (99999 numeric, 99999 categorical, 99999 datetime, 99999 other).")
+    for entry in _entries(profile):
+        cost = estimate_tokens(entry["text"] + "; ")
+        if used + cost + reserve <= budget:
+            listed.append(entry["text"])
+            used += cost
+        else:
+            omitted[entry["kind"]] = omitted.get(entry["kind"], 0) + entry["columns"]
+    description = header + ("; ".join(listed) or "none") + "."
+    if omitted:
+        description += (
+            f" Also {sum(omitted.values())} less informative columns ("
+            + ", ".join(f"{count} {kind}" for kind, count in omitted.items()) + ")."
+        )
+    return description
@@ -0,0 +1,145 @@
+import hashlib
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Serves files from a directory with strong ETags and answers matching If-None-Match with 304.
+# Every request is logged as (path, status) so tests can count real downloads; statuses queued
+# in server.failures (e.g. 503) are returned first.
+class _FileHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.failures:
+            self._reply(self.server.failures.pop(0), b"unavailable")
+            return
+        path = os.path.join(self.server.root, self.path.lstrip("/").split("?", 1)[0])
+        if not os.path.isfile(path):
+            self._reply(404, b"not found")
+            return
+        with open(path, "rb") as fh:
+            body = fh.read()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._reply(304, b"", etag=etag)
+            return
+        self._reply(200, body, etag=etag)
+
+    def _reply(self, status, body, etag=None):
+        self.server.log.append((self.path, status))
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if status == 200:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+# Minimal OpenAI-compatible chat completions endpoint. Answers are numbered ("answer 1", "answer 2", ...)
+# so tests can tell a fresh call from a cached one; statuses queued in server.failures (e.g. 429, 503)
+# are returned first with a Retry-After of server.retry_after, and server.max_active records the highest number of concurrent requests.
+class _OpenAIHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.calls += 1
+            status = server.failures.pop(0) if server.failures else 200
+            if status == 200:
+                server.answers += 1
+            answer = f"answer {server.answers}"
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            if status != 200:
+                self._json(status, {"error": {"message": f"status {status}", "type": "test"}}, {"Retry-After": server.retry_after})
+            elif body.get("stream"):
+                self._stream(body["model"], answer)
+            else:
+                message = {"role": "assistant", "content": answer}
+                self._json(200, {"id": "test", "object": "chat.completion", "created": 0, "model": body["model"],
+                                 "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+        finally:
+            with server.lock:
+                server.active -= 1
+        server.log.append((self.path, status))
+
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in answer.split(" "):
+            chunk = {"id": "test", "object": "chat.completion.chunk", "created": 0, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class LocalServer:
+    def __init__(self, handler, **attrs):
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        for name, value in attrs.items():
+            setattr(self.httpd, name, value)
+        self.httpd.log = []
+        self.base = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    # Counters and settings live on the HTTP server, where the handlers can reach them
+    def __getattr__(self, name):
+        return getattr(self.httpd, name)
+
+    def url(self, path):
+        return f"{self.base}/{path.lstrip('/')}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    server = LocalServer(_FileHandler, root=str(tmp_path), failures=[])
+    server.root = tmp_path
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def fake_openai():
+    server = LocalServer(_OpenAIHandler, lock=threading.Lock(), calls=0, answers=0, failures=[], retry_after="0", delay=0.0, active=0, max_active=0)
+    yield server
+    server.close()
+
+
+# OpenAI client for the fake endpoint; retries are left to the code under test
+@pytest.fixture
+def openai_client(fake_openai):
+    from openai import OpenAI
+
+    return OpenAI(api_key="test", base_url=fake_openai.url("v1"), max_retries=0)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import bar_sums, group_aggregate, heatmap_counts, histogram_bins, value_counts
+from charts import generate_plot
+
+
+def test_histogram_bins_count_every_value():
+    values = pd.Series(np.arange(1000, dtype=float))
+    bins, width = histogram_bins(values, 10)
+    assert len(bins) == 10
+    assert bins["count"].sum() == 1000
+    assert width == 99.9
+    assert bins["start"].iat[0] == 0 and bins["end"].iat[-1] == 999
+
+
+def test_histogram_bins_of_dates_and_text():
+    dates = pd.Series(pd.date_range("2024-01-01", periods=48, freq="h"))
+    bins, width = histogram_bins(dates, 2)
+    assert bins["count"].tolist() == [24, 24]
+    assert width == 23.5 * 3600 * 1000
+    assert pd.api.types.is_datetime64_any_dtype(bins["bin"])
+
+    bins, width = histogram_bins(pd.Series(["a", "b", "a", None]), 10)
+    assert width is None
+    assert dict(zip(bins["bin"], bins["count"])) == {"a": 2, "b": 1}
+
+
+def test_heatmap_counts_numeric_and_categorical():
+    x, y, z = heatmap_counts(pd.Series([0.0, 0.0, 1.0, 1.0]), pd.Series([0.0, 1.0, 1.0, 1.0]), 2)
+    assert z.tolist() == [[1, 0], [1, 2]]
+
+    x, y, z = heatmap_counts(pd.Series(["a", "b", "a"]), pd.Series(["u", "u", "v"]), 5)
+    assert list(x) == ["a", "b"] and list(y) == ["u", "v"]
+    assert z.tolist() == [[1, 1], [1, 0]]
+
+
+def test_bar_sums_and_value_counts():
+    df = pd.DataFrame({"x": ["a", "b", "a"], "c": ["u", "u", "v"], "y": [1, 2, 3]})
+    assert bar_sums(df, "x", "y").to_dict("list") == {"x": ["a", "b"], "y": [4, 2]}
+    assert bar_sums(df, "x", "y", "c")["y"].tolist() == [1, 3, 2]
+    assert value_counts(df, ["x"]).to_dict("list") == {"x": ["a", "b"], "count": [2, 1]}
+
+
+def test_group_aggregate_skips_non_numeric_columns():
+    df = pd.DataFrame({"g": ["a", "a", "b"], "v": [1.0, 3.0, 5.0], "flag": [True, False, True], "t": ["x", "y", "z"]})
+    assert group_aggregate(df, ["g"], "mean").to_dict("list") == {"g": ["a", "b"], "v": [2.0, 5.0]}
+    assert group_aggregate(df, ["g"], "count").to_dict("list") == {"g": ["a", "b"], "count": [2, 1]}
+
+
+def test_aggregate_charts_hold_bins_not_rows():
+    df = pd.DataFrame({"v": np.random.default_rng(0).normal(size=100_000), "g": ["a", "b"] * 50_000})
+    histogram = generate_plot(df, "Histogram", "v", hist_bins=30)
+    assert len(histogram.data[0].x) == 30
+    assert sum(histogram.data[0].y) == 100_000
+
+    bars = generate_plot(df, "Bar Chart", "g", "v")
+    assert len(bars.data[0].x) == 2
@@ -0,0 +1,43 @@
+import json
+
+import pandas as pd
+
+from batch import DEFAULT_CHARTS, collect_datasets, resolve_axes, run_batch
+from profiler import profile_dataframe
+
+
+def test_datasets_with_the_same_name_get_their_own_files(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "sales.csv").write_text("region,amount,cost\nnorth,1,2\nsouth,3,4\n")
+    (data / "sales.json").write_text(json.dumps([{"region": "east", "amount": 5, "cost": 6}]))
+
+    report = run_batch(collect_datasets(str(data)), DEFAULT_CHARTS, str(tmp_path / "out"), workers=2)
+
+    assert report["failed"] == 0
+    files = [chart["file"] for dataset in report["datasets"] for chart in dataset["charts"]]
+    assert len(files) == 6 and len(set(files)) == 6
+    assert len({f.split("/")[0] for f in files}) == 2
+    assert all((tmp_path / "out" / f).is_file() for f in files)
+    assert json.loads((tmp_path / "out" / "report.json").read_text())["datasets"][0]["recommendation"].startswith("[stub]")
+
+
+def test_non_text_column_names_and_bad_specs_fail_per_chart(tmp_path):
+    source = tmp_path / "years.json"
+    source.write_text(json.dumps([[2019, 2020], [1.5, 2.5], [3.5, 1.0]]))
+    charts = [{"chart_type": "Scatter Plot"}, {"chart_type": "Nope"}, {"chart_type": "Histogram", "x": "missing"}]
+
+    report = run_batch([{"source": str(source)}], charts, str(tmp_path / "out"), workers=1, recommender=None)
+
+    [dataset] = report["datasets"]
+    assert "error" not in dataset
+    assert "file" in dataset["charts"][0]
+    assert "Unknown chart type" in dataset["charts"][1]["error"]
+    assert "error" in dataset["charts"][2]
+
+
+def test_resolve_axes_prefers_named_coordinates():
+    df = pd.DataFrame({"value": [1.0, 2.0], "Latitude": [10.0, 20.0], "LON": [30.0, 40.0], 2020: [1, 2]})
+    spec = resolve_axes({"chart_type": "Geospatial scatter map"}, profile_dataframe(df))
+    assert (spec["x"], spec["y"]) == ("LON", "Latitude")
+    assert resolve_axes({"chart_type": "Histogram", "x": "value"}, profile_dataframe(df))["x"] == "value"
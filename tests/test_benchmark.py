@@ -0,0 +1,20 @@
+from benchmark import compare, measure, synthetic_frame
+from geobinning import geo_pyramid
+from profiler import dataset_fingerprint, profile_dataframe
+
+
+def test_every_repeat_is_measured_cold():
+    df = synthetic_frame(2000)
+    profiles, pyramids = [], []
+    measure(lambda: profiles.append(profile_dataframe(df)), repeat=3)
+    measure(lambda: pyramids.append(geo_pyramid(df, "lat_5", "lon_6")), repeat=3)
+
+    assert len({id(p) for p in profiles}) == 3
+    assert len({id(p) for p in pyramids}) == 3
+    assert dataset_fingerprint(df) == dataset_fingerprint(synthetic_frame(2000))
+
+
+def test_compare_reports_only_real_regressions():
+    baseline = {"csv/ingest": {"seconds": 1.0, "peak_bytes": 100}, "csv/profile": {"seconds": 0.001}}
+    results = {"csv/ingest": {"seconds": 2.0, "peak_bytes": 105}, "csv/profile": {"seconds": 0.004}}
+    assert compare(results, baseline) == ["csv/ingest seconds: 1 -> 2 (2.00x)"]
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from cache import DatasetCache, FigureCache, SharedDatasetStore
+from profiler import dataset_fingerprint
+
+
+def figure(n):
+    return go.Figure(go.Scatter(x=list(range(n)), y=list(range(n))))
+
+
+def test_evicted_figures_leave_the_dataset_index():
+    size = len(figure(50).to_json())
+    cache = FigureCache(max_bytes=int(size * 2.5))
+    for i in range(10):
+        cache.put_figure(f"dataset-{i}", ("Scatter Plot",), figure(50))
+
+    assert cache.stats()["entries"] == 2
+    assert [i for i in range(10) if cache.has_figure(f"dataset-{i}", ("Scatter Plot",))] == [8, 9]
+    assert cache.get_figure("dataset-0", ("Scatter Plot",)) is None
+
+    cache.invalidate_dataset("dataset-0")
+    cache.invalidate_dataset("dataset-9")
+    assert cache.stats()["entries"] == 1
+    assert cache.has_figure("dataset-8", ("Scatter Plot",))
+
+
+def test_invalidate_dataset_keeps_other_datasets():
+    cache = FigureCache()
+    cache.put_figure("a", ("Bar Chart",), figure(3))
+    cache.put_figure("a", ("Pie Chart",), figure(3))
+    cache.put_figure("b", ("Bar Chart",), figure(3))
+    cache.invalidate_dataset("a")
+
+    assert not cache.has_figure("a", ("Bar Chart",))
+    assert not cache.has_figure("a", ("Pie Chart",))
+    assert cache.has_figure("b", ("Bar Chart",))
+    assert cache.stats()["entries"] == 1
+
+
+def test_shared_store_keeps_same_shaped_datasets_apart():
+    a = pd.DataFrame({"x": np.arange(1000.0)})
+    b = a.copy()
+    b.loc[999, "x"] = 1e9
+    store = SharedDatasetStore()
+
+    shared_a = store.acquire("session-a", a, dataset_fingerprint(a))
+    shared_b = store.acquire("session-b", b, dataset_fingerprint(b))
+
+    assert shared_a is a
+    assert shared_b is b
+    assert shared_b["x"].max() == 1e9
+
+
+def test_shared_store_charges_cached_frames_once():
+    cache = DatasetCache(disk_dir=None)
+    df = pd.DataFrame({"x": np.arange(100_000)})
+    cache.put("url", df)
+    store = SharedDatasetStore(cache=cache)
+    store.acquire("session", df, dataset_fingerprint(df))
+
+    stats = store.stats()
+    assert stats["bytes"] == 0
+    assert stats["total_bytes"] == cache.stats()["bytes"]
+
+
+def test_shared_store_budget_includes_the_dataset_cache():
+    cache = DatasetCache(disk_dir=None)
+    cached = pd.DataFrame({"x": np.arange(100_000)})
+    cache.put("url", cached)
+    store = SharedDatasetStore(max_bytes=cache.stats()["bytes"] + 1000, cache=cache)
+    other = pd.DataFrame({"y": np.arange(100_000)})
+    store.acquire("session", other, dataset_fingerprint(other))
+    store.release("session")
+
+    assert store.stats()["entries"] == 0
+    assert store.evictions == 1
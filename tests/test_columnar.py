@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar
+from charts import generate_plot
+from compaction import compact_dataframe
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, "STORE_DIR", str(tmp_path))
+
+
+def test_reopened_categories_stay_categorical():
+    rng = np.random.default_rng(0)
+    df, _ = compact_dataframe(pd.DataFrame({"country": rng.choice(["BRA", "FRA", "USA"], 1000), "value": rng.normal(size=1000)}))
+    assert columnar.materialize("frame", df)
+    reopened = columnar.reopen("frame")
+
+    assert isinstance(reopened["country"].dtype, pd.CategoricalDtype)
+    assert isinstance(reopened["value"].dtype, pd.ArrowDtype)
+    assert reopened["country"].tolist() == df["country"].tolist()
+    for chart_type in ("Sun diagram", "Pie Chart", "Bar Chart", "Boxplot"):
+        assert generate_plot(reopened, chart_type, "country", "value") is not None
+
+
+def test_reopen_projects_columns():
+    assert columnar.materialize("frame", pd.DataFrame({"a": [1, 2], "b": [3, 4], "c": [5, 6]}))
+    assert list(columnar.reopen("frame", columns=["c", "a", "missing"]).columns) == ["c", "a"]
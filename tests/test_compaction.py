@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from compaction import compact_dataframe
+from filtering import DatasetIndex
+from profiler import profile_dataframe
+
+
+def frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "region": rng.choice(["north", "south", "east"], 5000),
+        "city": np.char.add("city-", rng.integers(0, 900, 5000).astype(str)),
+        "id": [f"row-{i}" for i in range(5000)],
+        "day": pd.date_range("2024-01-01", periods=5000, freq="h").strftime("%Y-%m-%d %H:%M:%S"),
+        "count": rng.integers(0, 100, 5000),
+        "ratio": rng.normal(size=5000),
+        "half": np.arange(5000) / 2,
+    })
+
+
+def test_compaction_keeps_every_value_and_shrinks_the_frame():
+    df = frame()
+    compacted, report = compact_dataframe(df)
+
+    assert report["after_bytes"] < report["before_bytes"]
+    assert set(report["columns"]) == {"region", "city", "day", "count", "half"}
+    assert isinstance(compacted["city"].dtype, pd.CategoricalDtype)
+    assert compacted["id"].dtype == df["id"].dtype
+    assert compacted["count"].dtype == np.int8
+    assert compacted["ratio"].dtype == np.float64
+    assert compacted["half"].dtype == np.float32
+    assert pd.api.types.is_datetime64_any_dtype(compacted["day"])
+    assert compacted["day"].dt.strftime("%Y-%m-%d %H:%M:%S").equals(df["day"])
+    for column in ("region", "city", "count", "half"):
+        assert compacted[column].astype(df[column].dtype).equals(df[column])
+    assert compacted.attrs["compaction"] == report
+
+
+def test_compaction_keeps_filter_kinds_and_low_cardinality_profile():
+    df = frame()
+    compacted, _ = compact_dataframe(df)
+    plain, compact = DatasetIndex(df), DatasetIndex(compacted)
+
+    for column in ("region", "city", "id", "count", "ratio", "half"):
+        assert compact.kind(column) == plain.kind(column), column
+    assert compact.kind("city") is None  # 900 cities stay over the multiselect cap
+    assert profile_dataframe(compacted)["columns"]["region"]["kind"] == profile_dataframe(df)["columns"]["region"]["kind"] == "categorical"
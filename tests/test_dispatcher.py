@@ -0,0 +1,117 @@
+import threading
+
+import openai
+import pytest
+
+from dispatcher import Dispatcher, DispatcherBusy
+
+
+def ask(client, text="hello"):
+    def fetch():
+        response = client.chat.completions.create(model="gpt-test", messages=[{"role": "user", "content": text}])
+        return response.choices[0].message.content
+    return fetch
+
+
+def test_rate_limited_calls_are_retried(fake_openai, openai_client):
+    fake_openai.failures.extend([429, 503])
+    delays = []
+    dispatcher = Dispatcher(max_retries=3, sleep=delays.append)
+
+    assert dispatcher.call("key", ask(openai_client)) == "answer 1"
+    assert fake_openai.calls == 3
+    assert delays == [0.0, 0.0]  # the fake endpoint sends Retry-After: 0
+    assert dispatcher.stats()["retries"] == 2
+
+
+def test_retry_after_is_capped(fake_openai, openai_client):
+    fake_openai.failures.append(429)
+    fake_openai.httpd.retry_after = "86400"
+    delays = []
+    dispatcher = Dispatcher(backoff_max=2.0, sleep=delays.append)
+
+    assert dispatcher.call("key", ask(openai_client)) == "answer 1"
+    assert delays == [2.0]
+
+
+def test_retries_give_up_after_the_limit(fake_openai, openai_client):
+    fake_openai.failures.extend([429] * 5)
+    dispatcher = Dispatcher(max_retries=2, sleep=lambda _: None)
+
+    with pytest.raises(openai.RateLimitError):
+        dispatcher.call("key", ask(openai_client))
+    assert fake_openai.calls == 3
+    assert dispatcher.stats()["failures"] == 1
+
+
+def test_client_errors_are_not_retried(fake_openai, openai_client):
+    fake_openai.failures.append(400)
+    dispatcher = Dispatcher(sleep=lambda _: None)
+
+    with pytest.raises(openai.BadRequestError):
+        dispatcher.call("key", ask(openai_client))
+    assert fake_openai.calls == 1
+
+
+def test_backoff_releases_the_slot(fake_openai, openai_client):
+    fake_openai.failures.append(429)
+    others = []
+
+    # While the first request backs off, a second one must get the only slot right away
+    def sleep(_):
+        others.append(dispatcher.call("other", ask(openai_client, "other")))
+
+    dispatcher = Dispatcher(max_concurrent=1, queue_timeout=0.5, sleep=sleep)
+    assert dispatcher.call("key", ask(openai_client)) == "answer 2"
+    assert others == ["answer 1"]
+
+
+def test_identical_requests_are_coalesced(fake_openai, openai_client):
+    fake_openai.httpd.delay = 0.3
+    dispatcher = Dispatcher()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(dispatcher.call("same", ask(openai_client)))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["answer 1"] * 5
+    assert fake_openai.calls == 1
+    assert dispatcher.stats()["coalesced"] == 4
+
+
+def test_concurrency_is_limited(fake_openai, openai_client):
+    fake_openai.httpd.delay = 0.2
+    dispatcher = Dispatcher(max_concurrent=2)
+    threads = [threading.Thread(target=dispatcher.call, args=(f"key-{i}", ask(openai_client, str(i)))) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake_openai.calls == 6
+    assert fake_openai.max_active == 2
+
+
+def test_queue_timeout_raises_busy(fake_openai, openai_client):
+    dispatcher = Dispatcher(max_concurrent=1, queue_timeout=0.1)
+    with dispatcher.slot():
+        with pytest.raises(DispatcherBusy):
+            dispatcher.call("key", ask(openai_client))
+    assert fake_openai.calls == 0
+
+
+def test_streams_hold_their_slot_until_consumed(fake_openai, openai_client):
+    fake_openai.failures.append(429)
+    dispatcher = Dispatcher(max_concurrent=1, queue_timeout=0.1, sleep=lambda _: None)
+
+    def open_stream():
+        return openai_client.chat.completions.create(model="gpt-test", messages=[{"role": "user", "content": "hi"}], stream=True)
+
+    with dispatcher.hold(open_stream) as stream:
+        assert dispatcher.stats()["active"] == 1
+        text = "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+    assert text.strip() == "answer 1"
+    assert dispatcher.stats()["active"] == 0
+    assert fake_openai.calls == 2
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from charts import generate_plot
+from downsampling import downsample_series, lttb_indices, render_mode, stratified_sample
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(10_000, dtype=float)
+    y = np.zeros(10_000)
+    y[4321] = 50.0
+    keep = lttb_indices(x, y, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 9_999
+    assert 4321 in keep
+    assert (np.diff(keep) > 0).all()
+
+
+def test_downsample_series_sorts_by_x():
+    df = pd.DataFrame({"x": np.arange(5000)[::-1], "y": np.sin(np.arange(5000) / 100)})
+    points = downsample_series(df, "x", "y", 200)
+    assert len(points) == 200
+    assert points["x"].is_monotonic_increasing
+    assert downsample_series(df, "x", "y", 10_000) is df
+
+
+def test_stratified_sample_keeps_rare_categories():
+    df = pd.DataFrame({"v": np.arange(100_000), "g": ["common"] * 99_990 + ["rare"] * 10})
+    sample = stratified_sample(df, 1000, by="g")
+    assert (sample["g"] == "rare").sum() == 10
+    assert 1000 <= len(sample) <= 1010
+    assert sample["v"].is_unique
+
+
+def test_point_charts_respect_the_budget():
+    df = pd.DataFrame({"a": np.random.default_rng(0).normal(size=50_000), "b": np.arange(50_000)})
+    fig = generate_plot(df, "Scatter Plot", "a", "b", max_points=2000)
+    assert len(fig.data[0].x) == 2000
+    assert fig.data[0].type == "scattergl"
+
+    fig = generate_plot(df, "Line Graph", "b", "a", max_points=500)
+    assert len(fig.data[0].x) == 500
+    assert render_mode(500) == "svg"
@@ -0,0 +1,59 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from charts import generate_plot
+from figure_encoding import encode_figure, typed_array
+
+
+def decode(spec):
+    if not isinstance(spec, dict):
+        return np.asarray(spec)
+    return np.frombuffer(base64.b64decode(spec["bdata"]), dtype=np.dtype(spec["dtype"]).newbyteorder("<"))
+
+
+def test_typed_arrays_pick_the_smallest_lossless_type():
+    assert typed_array(np.array([0, 200]))["dtype"] == "u1"
+    assert typed_array(np.array([-1, 70_000]))["dtype"] == "i4"
+    assert typed_array(np.array([0, 2 ** 40]))["dtype"] == "f8"
+    assert typed_array(np.array([0, 2 ** 60])) is None
+    assert typed_array(np.array(["a"])) is None
+
+    smooth = np.linspace(0, 1, 1000)
+    assert typed_array(smooth)["dtype"] == "f4"
+    # float32 would move these by about 4, a large share of their range of 9
+    offset = 1e8 + np.arange(10.0)
+    spec = typed_array(offset)
+    assert spec["dtype"] == "f8" and decode(spec).tolist() == offset.tolist()
+
+
+def test_encoded_figures_keep_their_values_and_shrink():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"x": rng.normal(size=20_000), "y": rng.normal(size=20_000)})
+    fig = generate_plot(df, "Scatter Plot", "x", "y")
+    encoded, report = encode_figure(fig)
+
+    assert report["after_bytes"] < report["before_bytes"]
+    assert report["typed_arrays"] >= 2
+    np.testing.assert_allclose(decode(encoded.data[0].x), decode(fig.data[0].x), rtol=1e-6, atol=1e-5)
+
+
+def test_repeated_text_axes_become_codes_with_tick_labels():
+    labels = ["north", "south", "east", "west"] * 500
+    fig = go.Figure(go.Box(x=labels, y=np.arange(2000.0)))
+    encoded, report = encode_figure(fig)
+
+    assert report["dictionary_axes"] == {"xaxis": 4}
+    axis = encoded.layout.xaxis
+    assert list(axis.ticktext) == ["north", "south", "east", "west"]
+    codes = decode(encoded.data[0].x)
+    assert [axis.ticktext[int(code)] for code in codes[:4]] == labels[:4]
+
+
+def test_short_or_numeric_axes_are_left_alone():
+    fig = go.Figure(go.Bar(x=["a", "b"], y=[1, 2]))
+    encoded, report = encode_figure(fig)
+    assert report["dictionary_axes"] == {}
+    assert list(encoded.data[0].x) == ["a", "b"]
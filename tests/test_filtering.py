@@ -0,0 +1,54 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import filtering
+from filtering import DatasetIndex, apply_filters, dataset_index
+
+
+def frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "value": rng.normal(size=1000),
+        "group": rng.choice(["a", "b", "c"], 1000),
+        "when": pd.date_range("2024-01-01", periods=1000, freq="h"),
+        "id": [f"row-{i}" for i in range(1000)],
+    })
+
+
+def test_column_kinds_are_profiled_once(monkeypatch):
+    calls = []
+    profile = filtering.profile_dataframe
+    monkeypatch.setattr(filtering, "profile_dataframe", lambda df, key=None: calls.append(key) or profile(df, key))
+    df = frame()
+    index = DatasetIndex(df, key="dataset")
+    for _ in range(3):
+        kinds = {column: index.kind(column) for column in df.columns}
+
+    assert kinds == {"value": "range", "group": "categorical", "when": "range", "id": None}
+    assert calls == ["dataset"]
+
+
+def test_filters_match_boolean_masks():
+    df = frame()
+    filters = [("range", "value", -0.5, 0.5), ("in", "group", ("a", "c"))]
+    expected = df[df["value"].between(-0.5, 0.5) & df["group"].isin(["a", "c"])]
+
+    assert apply_filters(df, filters, key="dataset").equals(expected)
+    assert apply_filters(df, [], key="dataset") is df
+
+
+def test_indexes_do_not_keep_frames_alive():
+    df = frame()
+    alive = weakref.ref(df)
+    assert len(apply_filters(df, [("in", "group", ("a",))], key="dataset-weak")) < len(df)
+    del df
+    gc.collect()
+    assert alive() is None
+
+    again = frame()
+    index = dataset_index(again, key="dataset-weak")
+    assert index.df is again
+    assert index.categories("group") == ["a", "b", "c"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import generate_plot
+from geobinning import LEVEL_DEGREES, geo_pyramid, location_values
+
+
+def points(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"lat": rng.uniform(-60, 70, n), "lon": rng.uniform(-180, 180, n)})
+
+
+def test_every_level_counts_every_valid_point():
+    df = points()
+    df.loc[0, "lat"] = 95.0  # out of range
+    df.loc[1, "lon"] = np.nan
+    df.loc[2, "lon"] = 190.0  # wraps to -170
+    pyramid = geo_pyramid(df, "lat", "lon")
+
+    assert pyramid.points == len(df) - 2
+    for level in range(len(LEVEL_DEGREES)):
+        for grid in ("square", "hex"):
+            cells = pyramid.level(level, grid)
+            assert cells["count"].sum() == pyramid.points
+            assert cells["lon"].between(-180, 180).all() and cells["lat"].between(-90, 90).all()
+
+
+def test_coarse_levels_match_direct_binning():
+    df = points(5000)
+    cells = geo_pyramid(df, "lat", "lon").level(0)
+    size = LEVEL_DEGREES[0]
+    direct = df.groupby([np.floor((df["lon"] + 180) / size), np.floor((df["lat"] + 90) / size)]).size()
+    assert sorted(cells["count"]) == sorted(direct)
+
+
+def test_auto_level_respects_the_cell_budget():
+    pyramid = geo_pyramid(points(), "lat", "lon")
+    level = pyramid.auto_level(1000)
+    assert len(pyramid.level(level)) <= 1000 < len(pyramid.level(level + 1))
+    assert pyramid.auto_level(10) == 0  # the coarsest level is the floor
+
+    fig = generate_plot(points(), "Geospatial scatter map", "lon", "lat", max_points=1000)
+    assert len(fig.data[0].lat) <= 1000
+    assert sum(fig.data[0].marker.color) == 20_000
+
+
+def test_location_values_average_by_default():
+    df = pd.DataFrame({"iso": ["FRA", "FRA", "DEU", None], "rate": [2.0, 4.0, 3.0, 9.0], "label": ["a", "a", "b", "c"]})
+
+    values, color = location_values(df, "iso", "rate")
+    assert color == "rate"
+    assert dict(zip(values["iso"], values["rate"])) == {"DEU": 3.0, "FRA": 3.0}
+    summed, _ = location_values(df, "iso", "rate", "sum")
+    assert dict(zip(summed["iso"], summed["rate"])) == {"DEU": 3.0, "FRA": 6.0}
+    assert location_values(df, "iso", "label")[0].to_dict("list") == {"iso": ["DEU", "FRA"], "label": ["b", "a"]}
+    counts, color = location_values(df, "iso", None)
+    assert color == "count" and counts.to_dict("list") == {"iso": ["DEU", "FRA"], "count": [1, 2]}
+
+
+@pytest.mark.parametrize("how, expected", [("mean", 3.0), ("max", 4.0), ("count", 2)])
+def test_choropleth_uses_the_chosen_aggregation(how, expected):
+    df = pd.DataFrame({"iso": ["FRA", "FRA"], "rate": [2.0, 4.0]})
+    fig = generate_plot(df, "Choropleth map", "iso", "rate", location_aggregation=how)
+    assert list(fig.data[0].z) == [expected]
@@ -0,0 +1,200 @@
+import io
+
+import pandas as pd
+import pytest
+
+import ingest
+from cache import DatasetCache
+from ingest import DownloadTooLarge, FetchError, excel_sheets, read_csv_chunked, read_excel_fast, read_json_stream, read_path, read_url
+
+
+# Revalidate on every read unless a test is about the freshness window
+@pytest.fixture(autouse=True)
+def always_revalidate(monkeypatch):
+    monkeypatch.setattr(ingest, "FRESH_SECONDS", 0)
+
+
+def statuses(server):
+    return [status for _, status in server.log]
+
+
+def test_read_url_downloads_once_and_revalidates(file_server):
+    (file_server.root / "data.csv").write_text("a,b\n1,2\n3,4\n")
+    cache = DatasetCache(disk_dir=None)
+    url = file_server.url("data.csv")
+
+    first = read_url(url, cache=cache)
+    second = read_url(url, cache=cache)
+
+    assert first.to_dict("list") == {"a": [1, 3], "b": [2, 4]}
+    assert second is first
+    assert statuses(file_server) == [200, 304]
+
+
+def test_read_url_skips_the_server_while_fresh(file_server, monkeypatch):
+    monkeypatch.setattr(ingest, "FRESH_SECONDS", 60)
+    (file_server.root / "data.csv").write_text("a\n1\n")
+    cache = DatasetCache(disk_dir=None)
+    url = file_server.url("data.csv")
+
+    first = read_url(url, cache=cache)
+    assert read_url(url, cache=cache) is first
+    assert statuses(file_server) == [200]
+
+
+def test_read_url_serves_the_cached_frame_when_the_server_fails(file_server):
+    (file_server.root / "data.csv").write_text("a\n1\n")
+    cache = DatasetCache(disk_dir=None)
+    url = file_server.url("data.csv")
+    first = read_url(url, cache=cache)
+
+    file_server.failures.append(503)
+    assert read_url(url, cache=cache) is first
+    file_server.close()
+    assert read_url(url, cache=cache) is first
+
+
+def test_read_url_refetches_changed_content(file_server):
+    path = file_server.root / "data.csv"
+    path.write_text("a\n1\n")
+    cache = DatasetCache(disk_dir=None)
+    url = file_server.url("data.csv")
+
+    read_url(url, cache=cache)
+    path.write_text("a\n1\n2\n")
+    changed = read_url(url, cache=cache)
+
+    assert changed["a"].tolist() == [1, 2]
+    assert statuses(file_server) == [200, 200]
+
+
+def test_read_url_refetches_when_cached_frame_was_evicted(file_server):
+    (file_server.root / "data.csv").write_text("a\n1\n")
+    cache = DatasetCache(disk_dir=None)
+    url = file_server.url("data.csv")
+
+    read_url(url, cache=cache)
+    cache.clear()
+    again = read_url(url, cache=cache)
+
+    assert again["a"].tolist() == [1]
+    assert statuses(file_server) == [200, 304, 200]
+
+
+def test_read_url_enforces_size_cap(file_server):
+    (file_server.root / "big.csv").write_text("a\n" + "1\n" * 1000)
+    with pytest.raises(DownloadTooLarge):
+        read_url(file_server.url("big.csv"), max_bytes=100, cache=DatasetCache(disk_dir=None))
+
+
+def test_read_url_reports_http_errors(file_server):
+    with pytest.raises(FetchError, match="HTTP 404"):
+        read_url(file_server.url("missing.csv"), cache=DatasetCache(disk_dir=None))
+
+
+def test_validators_are_capped(file_server, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_VALIDATORS", 2)
+    cache = DatasetCache(disk_dir=None)
+    for name in ("a.csv", "b.csv", "c.csv"):
+        (file_server.root / name).write_text("a\n1\n")
+        read_url(file_server.url(name), cache=cache)
+
+    read_url(file_server.url("c.csv"), cache=cache)
+    read_url(file_server.url("a.csv"), cache=cache)
+
+    # c.csv is still remembered and revalidated; a.csv was forgotten and is downloaded again
+    assert statuses(file_server)[3:] == [304, 200]
+
+
+def read_json_text(text):
+    return read_json_stream(io.BytesIO(text.encode("utf-8")))
+
+
+def test_json_column_arrays_keep_every_column():
+    frame = read_json_text('{"time": [1, 2, 3], "value": [4, 5, 6]}')
+    assert frame.to_dict("list") == {"time": [1, 2, 3], "value": [4, 5, 6]}
+
+
+def test_json_wrapper_records_are_streamed():
+    frame = read_json_text('{"total": 2, "results": [{"a": 1, "b": {"c": 2}}, {"a": 3, "b": {"c": 4}}]}')
+    assert frame.to_dict("list") == {"a": [1, 3], "b.c": [2, 4]}
+
+
+def test_json_row_lists_take_their_column_names():
+    before = read_json_text('{"columns": ["a", "b"], "data": [[1, 2], [3, 4]]}')
+    after = read_json_text('{"data": [[1, 2], [3, 4]], "columns": ["a", "b"]}')
+    assert before.to_dict("list") == after.to_dict("list") == {"a": [1, 3], "b": [2, 4]}
+
+
+def csv_stream(rows):
+    lines = ["city;amount"] + [f"c{i % 7};{i}" for i in range(rows)]
+    return io.BufferedReader(io.BytesIO("\n".join(lines).encode("utf-8")))
+
+
+def test_chunked_csv_keeps_every_row_that_fits():
+    df = read_csv_chunked(csv_stream(1000), chunk_rows=100)
+    assert len(df) == 1000
+    assert df["amount"].sum() == sum(range(1000))
+    assert df.attrs["sampled"] is False
+
+
+def test_chunked_csv_samples_under_the_memory_limit():
+    seen = []
+    df = read_csv_chunked(csv_stream(10_000), chunk_rows=1000, memory_limit=20_000, progress=lambda rows, _: seen.append(rows))
+    assert 0 < len(df) < 10_000
+    assert df.attrs["sampled"] is True
+    assert df.attrs["source_rows"] == 10_000
+    assert df["amount"].is_unique and df["amount"].between(0, 9_999).all()
+    assert df["amount"].max() > 5_000  # later chunks are represented, not just the head
+    assert seen == list(range(1000, 10_001, 1000))
+
+
+def test_chunked_csv_aggregates_across_chunks():
+    df = read_csv_chunked(csv_stream(1000), mode="aggregate", chunk_rows=64, group_by=["city"], value_columns=["amount"])
+    expected = pd.DataFrame({"city": [f"c{i % 7}" for i in range(1000)], "amount": range(1000)}).groupby("city")["amount"]
+    result = df.set_index("city")
+    assert result["rows__count"].to_dict() == expected.size().to_dict()
+    assert result["amount__sum"].to_dict() == expected.sum().astype(float).to_dict()
+    assert result["amount__max"].to_dict() == expected.max().astype(float).to_dict()
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "book.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"id": range(10), "name": [f"n{i}" for i in range(10)], 2020: [i * 1.5 for i in range(10)]}).to_excel(writer, sheet_name="data", index=False)
+        pd.DataFrame({"x": [1, 2]}).to_excel(writer, sheet_name="notes", index=False)
+    return str(path)
+
+
+def test_excel_sheets_lists_names_sizes_and_headers(workbook):
+    assert excel_sheets(workbook) == [
+        {"name": "data", "rows": 11, "columns": ["id", "name", "2020"]},
+        {"name": "notes", "rows": 3, "columns": ["x"]},
+    ]
+
+
+@pytest.mark.parametrize("engine", ["openpyxl", "calamine"])
+def test_read_excel_fast_projects_sheet_columns_and_rows(workbook, engine):
+    if engine == "calamine" and not ingest.calamine_available():
+        pytest.skip("python-calamine is not installed")
+    df = read_excel_fast(workbook, sheet="data", usecols=["id", "name"], skip_rows=2, nrows=3, engine=engine)
+    assert df.to_dict("list") == {"id": [2, 3, 4], "name": ["n2", "n3", "n4"]}
+
+    notes = read_path(workbook, excel_options={"sheet": "notes", "engine": engine})
+    assert notes["x"].tolist() == [1, 2]
+
+
+def test_json_wrapper_keys_win_over_other_object_arrays():
+    frame = read_json_text('{"links": [{"rel": "self"}], "data": [{"a": 1}, {"a": 2}], "meta": {"n": 2}}')
+    assert frame.to_dict("list") == {"a": [1, 2]}
+
+    frame = read_json_text('{"links": [{"rel": "self"}], "orders": [{"a": 1}, {"a": 2}]}')
+    assert frame.to_dict("list") == {"a": [1, 2]}
+
+
+def test_json_scalars_next_to_nested_objects_are_kept():
+    frame = read_json_text('[{"a": {"b": 1}}, {"a": 5}, {"a": null}]')
+    assert frame["a"].tolist()[1] == 5
+    assert frame["a.b"].tolist()[0] == 1
+    assert frame["a"].isna().tolist() == [True, False, True]
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from profiler import dataset_fingerprint, profile_dataframe
+
+
+def test_fingerprint_changes_with_any_cell():
+    original = pd.DataFrame({"x": np.arange(100_000), "label": ["a", "b"] * 50_000})
+    changed = original.copy()
+    changed.iloc[1, 0] = 10 ** 9
+
+    assert dataset_fingerprint(original) != dataset_fingerprint(changed)
+    assert dataset_fingerprint(original) == dataset_fingerprint(original.copy())
+    assert profile_dataframe(changed)["columns"]["x"]["max"] == 10 ** 9
+    assert profile_dataframe(original)["columns"]["x"]["max"] == 99_999
+
+
+def test_fingerprint_handles_unhashable_cells():
+    df = pd.DataFrame({"tags": [["a"], ["b", "c"]]})
+    assert dataset_fingerprint(df) != dataset_fingerprint(pd.DataFrame({"tags": [["a"], ["b"]]}))
@@ -0,0 +1,105 @@
+import pytest
+
+import recommendations
+from recommendations import RecommendationCache, cached_recommendation, recommendation_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(recommendations, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return RecommendationCache(path=str(tmp_path / "recommendations.sqlite"), ttl=3600, max_bytes=1024 * 1024)
+
+
+def fetcher(client, description):
+    def fetch():
+        response = client.chat.completions.create(
+            model="gpt-test", messages=recommendations.recommendation_messages(description), max_tokens=10,
+        )
+        return response.choices[0].message.content
+    return fetch
+
+
+def test_miss_then_hit(cache, openai_client, fake_openai):
+    fetch = fetcher(openai_client, "two columns")
+    first = cached_recommendation("two columns", "gpt-test", fetch, cache=cache)
+    second = cached_recommendation("two columns", "gpt-test", fetch, cache=cache)
+
+    assert first == second == "answer 1"
+    assert fake_openai.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_keys_separate_descriptions_and_models(cache, openai_client, fake_openai):
+    cached_recommendation("two columns", "gpt-test", fetcher(openai_client, "two columns"), cache=cache)
+    other = cached_recommendation("three columns", "gpt-test", fetcher(openai_client, "three columns"), cache=cache)
+
+    assert other == "answer 2"
+    assert recommendation_key("a", "gpt-test") != recommendation_key("a", "gpt-other")
+    assert fake_openai.calls == 2
+
+
+def test_expired_answers_are_fetched_again(cache, clock, openai_client, fake_openai):
+    fetch = fetcher(openai_client, "two columns")
+    cached_recommendation("two columns", "gpt-test", fetch, cache=cache)
+    clock.now += 3601
+    again = cached_recommendation("two columns", "gpt-test", fetch, cache=cache)
+
+    assert again == "answer 2"
+    assert fake_openai.calls == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_answers_are_evicted(tmp_path, clock):
+    cache = RecommendationCache(path=str(tmp_path / "small.sqlite"), ttl=0, max_bytes=350)
+    for name in ("a", "b", "c"):
+        cache.put(name, name * 100)
+        clock.now += 1
+    cache.get("a")  # used most recently, so "b" goes first
+    clock.now += 1
+    cache.put("d", "d" * 100)
+
+    assert cache.get("b") is None
+    assert [cache.get(name) for name in ("a", "c", "d")] == ["a" * 100, "c" * 100, "d" * 100]
+    assert cache.stats()["bytes"] <= 350
+
+
+def test_refresh_replaces_the_cached_answer(cache, openai_client, fake_openai):
+    fetch = fetcher(openai_client, "two columns")
+    cached_recommendation("two columns", "gpt-test", fetch, cache=cache)
+    refreshed = cached_recommendation("two columns", "gpt-test", fetch, cache=cache, refresh=True)
+    later = cached_recommendation("two columns", "gpt-test", fetch, cache=cache)
+
+    assert refreshed == later == "answer 2"
+    assert fake_openai.calls == 2
+
+
+def test_streamed_answers_are_cached(cache, openai_client, fake_openai):
+    def stream_tokens():
+        stream = openai_client.chat.completions.create(
+            model="gpt-test", messages=recommendations.recommendation_messages("streamed"), stream=True,
+        )
+        return (chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+
+    job = recommendations.start_recommendation("streamed", "gpt-test", stream_tokens, cache=cache)
+    assert job.done.wait(10)
+
+    assert job.error is None
+    assert job.text.strip() == "answer 1"
+    assert cache.get(recommendation_key("streamed", "gpt-test")) == job.text
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from profiler import profile_dataframe
+from recommendations import describe_dataset
+from schema_summary import estimate_tokens, summarize_schema
+
+
+def wide_frame(sensors=2000):
+    rng = np.random.default_rng(0)
+    data = {f"sensor_{i}": rng.normal(size=200) for i in range(sensors)}
+    data["site"] = rng.choice(["a", "b", "c"], 200)
+    data["when"] = pd.date_range("2024-01-01", periods=200, freq="D")
+    data["id"] = [f"row-{i}" for i in range(200)]
+    data["constant"] = 1.0
+    return pd.DataFrame(data)
+
+
+def test_wide_descriptions_fit_the_budget():
+    df = wide_frame()
+    description = describe_dataset(df, token_budget=300)
+    assert estimate_tokens(description) <= 300
+    assert description.startswith(f"The data set has 200 rows and {df.shape[1]} columns")
+    assert "2000 numeric columns 'sensor_0'..'sensor_1999'" in description
+
+
+def test_informative_columns_come_first():
+    profile = profile_dataframe(wide_frame(sensors=5))
+    listed = summarize_schema(profile, budget=200).split("Most informative columns: ", 1)[1]
+    order = [listed.index(f"'{name}'") for name in ("site", "when", "sensor_0", "id", "constant")]
+    assert order == sorted(order)
+
+    short = summarize_schema(profile, budget=80)
+    assert "'constant'" not in short
+    assert short.endswith("Also 3 less informative columns (1 datetime, 1 other, 1 numeric).")
+
+
+def test_narrow_datasets_keep_the_column_by_column_description():
+    df = wide_frame(sensors=2)
+    assert describe_dataset(df).startswith("The data set has 200 rows and 6 columns. The 'sensor_0' column")
@@ -1,76 +1,161 @@
+import time
+import uuid
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import requests
-import openai
-from openai import OpenAI
+
+import columnar as columnar_store
+from aggregation import AGGREGATIONS, group_aggregate
+from cache import cached_figure, cached_read, dataset_cache, figure_cache, shared_store
+from charts import CHART_TYPES, POINT_CHART_TYPES, generate_plot
+from compaction import COMPACT_BY_DEFAULT, compact_dataframe
+from dispatcher import openai_dispatcher
+from downsampling import FULL_POINTS, PREVIEW_POINTS
+from figure_encoding import ENCODE_BY_DEFAULT, encode_figure
+from filtering import apply_filters, dataset_index
+from geobinning import GRIDS, LEVEL_DEGREES
+from ingest import (
+    CSV_MEMORY_LIMIT, EXCEL_ENGINES, JSON_EXTENSIONS, calamine_available, excel_sheets, read_csv_chunked,
+    read_csv_columns, read_excel_fast, read_json_stream, read_url,
+)
+from instrumentation import frame_bytes, span, start_run, timed, to_prometheus
+from profiler import dataset_fingerprint
+from recommendations import (
+    RECOMMENDATION_TIMEOUT, cached_recommendation, describe_dataset, recommendation_cache,
+    recommendation_key, recommendation_messages, start_recommendation,
+)
 
 
 # Cargar la API key desde el entorno
-client = OpenAI(
-    api_key=st.secrets["OPENAI_API_KEY"],
-)
+# OPENAI_BASE_URL points the client at any OpenAI-compatible endpoint (e.g. a local fake for offline tests)
+# Retries are left to the shared dispatcher, which also limits and coalesces requests.
+# The client (and the openai package) is only loaded when the first recommendation is requested,
+# so the page comes up quickly and still works without the secret.
+@st.cache_resource
+def get_client():
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=st.secrets["OPENAI_API_KEY"],
+        base_url=st.secrets.get("OPENAI_BASE_URL"),
+        max_retries=0,
+    )
 
 st.set_page_config(
     page_title="VisBot - Visualization Recommender with AI",
     page_icon="https://raw.githubusercontent.com/disenodc/visbot/main/bot_2.ico",
 )
 
-# Function to read data from a file or URL
-def read_data(file_path_or_url):
+# Function to read data from a file or URL.
+# csv_options switches CSV sources to the chunked, memory-bounded reader (see ingest.read_csv_chunked)
+# excel_options switches XLSX sources to the projected, streaming reader (see ingest.read_excel_fast)
+# compact=True shrinks column types losslessly after parsing (see compaction.compact_dataframe)
+@timed("read_data")
+def read_data(file_path_or_url, csv_options=None, progress=None, columnar=False, excel_options=None, compact=False):
     if isinstance(file_path_or_url, str) and file_path_or_url.startswith('http'):
-        response = requests.get(file_path_or_url)
-        content_type = response.headers.get('Content-Type')
-        if 'application/json' in content_type:
-            df = pd.read_json(response.content)
-        elif 'text/csv' in content_type:
-            first_line = response.text.splitlines()[0]
-            delimiter = ';' if ';' in first_line else ','
-            df = pd.read_csv(file_path_or_url, delimiter=delimiter)
-        elif 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' in content_type:
-            df = pd.read_excel(file_path_or_url)
-        else:
-            raise ValueError("File format not supported or content could not be identified.")
+        # Single streamed download, revalidated with conditional GETs on later reruns
+        df = read_url(file_path_or_url, csv_options=csv_options, progress=progress, columnar=columnar,
+                      excel_options=excel_options, compact=compact)
     else:
-        if file_path_or_url.name.endswith('.csv'):
+        if file_path_or_url.name.endswith('.xlsx') and excel_options:
+            df = read_excel_fast(file_path_or_url, **excel_options)
+        elif file_path_or_url.name.endswith('.csv') and csv_options:
+            df = read_csv_chunked(file_path_or_url, total_bytes=getattr(file_path_or_url, "size", None), progress=progress, **csv_options)
+        elif file_path_or_url.name.endswith('.csv'):
             first_line = file_path_or_url.readline().decode('utf-8')
             file_path_or_url.seek(0)
             delimiter = ';' if ';' in first_line else ','
             df = pd.read_csv(file_path_or_url, delimiter=delimiter)
         elif file_path_or_url.name.endswith('.xlsx'):
             df = pd.read_excel(file_path_or_url)
-        elif file_path_or_url.name.endswith('.json'):
-            df = pd.read_json(file_path_or_url)
+        elif file_path_or_url.name.endswith(JSON_EXTENSIONS):
+            # Arrays, NDJSON and {"data": [...]} wrappers, parsed in batches with nested fields flattened
+            df = read_json_stream(file_path_or_url, total_bytes=getattr(file_path_or_url, "size", None), progress=progress)
         else:
             raise ValueError("Unsupported file format.")
+        if compact:
+            with span("compact") as compact_span:
+                df, report = compact_dataframe(df)
+                compact_span["frame_bytes"] = report["after_bytes"]
     return df
 
 # Función para obtener recomendaciones de visualización de OpenAI utilizando GPT-4
-def get_openai_recommendation(df):
-    description = f"The data set has {df.shape[0]} rows and {df.shape[1]} columns. "
-    for column in df.columns:
-        description += f"The '{column}' column is of type {df[column].dtype}, "
-        if pd.api.types.is_numeric_dtype(df[column]):
-            description += f"and contains numerical values ranging from {df[column].min()} to {df[column].max()}. "
-        
-        elif isinstance(df[column].dtype, pd.CategoricalDtype) or df[column].nunique() < 10:
-            description += f"and contains {df[column].nunique()} unique categories. "
-
-        elif pd.api.types.is_datetime64_any_dtype(df[column]):
-            description += f"and contains time data ranging from {df[column].min()} to {df[column].max()}. "
-
-    response = client.chat.completions.create(
-        model= "gpt-4-turbo",  # Cambiamos a gpt-4 o gpt-4-turbo
-        messages=[
-            {"role": "system", "content": "You are an expert assistant in data analysis specialized in visualization."},
-            {"role": "user", "content": f"I have a data set. {description} What type of visualizations would you recommend from this data? Describe and if possible recommend options"}
-        ],
-        max_tokens=500  # Increase tokens if more context is desired
-    )
-    return response.choices[0].message.content
+# Answers are cached on disk by a fingerprint of the description, model and prompt version;
+# refresh=True skips the cache and stores a fresh answer.
+@timed("openai_recommendation")
+def get_openai_recommendation(df, model="gpt-4-turbo", refresh=False):
+    description = describe_dataset(df)
+
+    def fetch():
+        response = get_client().chat.completions.create(
+            model=model,  # Cambiamos a gpt-4 o gpt-4-turbo
+            messages=recommendation_messages(description),
+            max_tokens=500  # Increase tokens if more context is desired
+        )
+        return response.choices[0].message.content
+
+    return cached_recommendation(description, model, fetch, refresh=refresh, dispatcher=openai_dispatcher)
+
+# Streaming variant for the UI: returns the cached answer as a string, or a RecommendationJob
+# that streams tokens on a background thread. A job for a different dataset is cancelled.
+def start_openai_recommendation(df, model="gpt-4-turbo", refresh=False):
+    description = describe_dataset(df)
+    key = recommendation_key(description, model)
+    job = st.session_state.get("recommendation_job")
+    if job is not None and (job.key != key or refresh):
+        job.cancel()
+        job = None
+    if job is not None and not job.error and not job.cancelled.is_set():
+        return job
+    if not refresh:
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            return cached
+
+    client = get_client()  # resolved here so a missing secret is reported before the job starts
+
+    # Holds one dispatcher slot for the whole stream; opening it is retried on 429/5xx
+    def stream_tokens():
+        with openai_dispatcher.hold(lambda: client.chat.completions.create(
+            model=model,
+            messages=recommendation_messages(description),
+            max_tokens=500,
+            stream=True,
+            timeout=RECOMMENDATION_TIMEOUT,
+        )) as stream:
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.close()
+
+    job = start_recommendation(description, model, stream_tokens)
+    st.session_state["recommendation_job"] = job
+    return job
+
+# Poll a streaming job into its placeholder until it finishes or times out
+def render_recommendation(placeholder, recommendation):
+    if isinstance(recommendation, str):
+        placeholder.markdown(recommendation)
+        return
+    job = recommendation
+    while not job.done.wait(0.1):
+        if time.monotonic() > job.deadline:
+            job.cancel()
+            break
+        placeholder.markdown(job.text + " ▌")
+    if job.error is not None:
+        placeholder.error(f"Error getting OpenAI recommendations: {str(job.error)}")
+    elif not job.done.is_set():
+        placeholder.warning("The AI recommendation timed out.")
+    else:
+        placeholder.markdown(job.text)
 
 # Function to generate visualizations
 def recommend_and_plot(df):
+    import plotly.express as px
+
     # st.subheader("Recommended Visualizations")
     # Configurable parameters in the sidebar
     st.sidebar.header("Configuration")
@@ -105,112 +190,296 @@ def recommend_and_plot(df):
         # Any other unforeseen error
         st.error(f"An unexpected error occurred: {str(e)}")
 
-# Function to generate charts depending on selected data types and chart type
-def generate_plot(df, chart_type, x_axis=None, y_axis=None, z_axis=None, hist_bins=30, scatter_size=10):
-    fig = None
-    if chart_type == "Scatter Plot":
-        fig = px.scatter(df, x=x_axis, y=y_axis, title=f'Scatter plot from {x_axis} vs {y_axis}', size_max=scatter_size)
-    elif chart_type == "Bar Chart":
-        fig = px.bar(df, x=x_axis, y=y_axis, title=f'Bar chart from {x_axis} vs {y_axis}')
-    elif chart_type == "Stacked Bar Chart":
-        fig = px.bar(df, x=x_axis, y=y_axis, color=z_axis, title=f'Stacked Bar Chart from {x_axis} vs {y_axis} for {z_axis}', barmode='stack')
-    elif chart_type == "Grouped Bar Chart":
-        fig = px.bar(df, x=x_axis, y=y_axis, color=z_axis, title=f'Grouped Bar Chart from {x_axis} vs {y_axis} for {z_axis}', barmode='group')
-    elif chart_type == "Histogram":
-        fig = px.histogram(df, x=x_axis, nbins=hist_bins, title=f'Histogram from {x_axis}')
-    elif chart_type == "Line Graph":
-        fig = px.line(df, x=x_axis, y=y_axis, title=f'Line Graph from {x_axis} vs {y_axis}')
-    elif chart_type == "Area Chart":
-         fig = px.area(df, x=x_axis, y=y_axis, title=f'Area Chart from {x_axis} vs {y_axis}')
-    elif chart_type == "Pie Chart":
-         fig = px.pie(df, names=x_axis, title=f'Pie Chart from {x_axis}')
-    elif chart_type == "3D Scatter Plot":
-         fig = px.scatter_3d(df, x=x_axis, y=y_axis, z=z_axis, title=f'Scatter plot 3D from {x_axis}, {y_axis} and {z_axis}')
-    elif chart_type == "Boxplot":
-         fig = px.box(df, x=x_axis, y=y_axis, title=f'Boxplot from {x_axis} vs {y_axis}')
-    elif chart_type == "Violin plot":
-         fig = px.violin(df, x=x_axis, y=y_axis, title=f'Violin from {x_axis} vs {y_axis}')
-    elif chart_type == "Heat map":
-         fig = px.density_heatmap(df, x=x_axis, y=y_axis, title=f'Heatmap from {x_axis} vs {y_axis}')
-    elif chart_type == "Geospatial scatter map":
-         fig = px.scatter_geo(df, lat=y_axis, lon=x_axis, title=f'Geospatial scatter map from {x_axis} and {y_axis}')
-    elif chart_type == "Choropleth map":
-         fig = px.choropleth(df, locations=x_axis, color=y_axis, title=f'Choropleth map from {x_axis} and {y_axis}')
-    elif chart_type == "Sun diagram":
-         fig = px.sunburst(df, path=[x_axis], title=f'Sun diagram from {x_AXIS} and {y_AXIS}')
-    
+# Sidebar controls for the chunked CSV mode; returns read_csv_chunked options or None
+def large_csv_options(url_input, uploaded_file):
+    is_csv_upload = uploaded_file is not None and uploaded_file.name.endswith('.csv')
+    if not (url_input or is_csv_upload):
+        return None
+    if not st.sidebar.checkbox("Large CSV mode (chunked, memory-bounded)", key="large_csv_mode"):
+        return None
+
+    if is_csv_upload and not url_input:
+        columns = read_csv_columns(uploaded_file)
+        usecols = st.sidebar.multiselect("Columns to load", columns, default=columns, key="large_csv_columns")
+    else:
+        typed = st.sidebar.text_input("Columns to load (comma-separated, empty loads all)", key="large_csv_columns_text")
+        columns = [c.strip() for c in typed.split(",") if c.strip()]
+        usecols = columns
+    memory_mb = st.sidebar.slider("Memory ceiling (MB)", min_value=32, max_value=4096, value=CSV_MEMORY_LIMIT // (1024 * 1024), step=32, key="large_csv_memory")
+    mode = st.sidebar.radio("Large file strategy", ["Sample rows", "Aggregate per chunk"], key="large_csv_strategy")
+
+    options = {"usecols": usecols or None, "memory_limit": memory_mb * 1024 * 1024}
+    if mode == "Aggregate per chunk":
+        group_by = st.sidebar.multiselect("Group by", usecols or columns, key="large_csv_group_by")
+        value_columns = st.sidebar.multiselect("Values to aggregate", [c for c in (usecols or columns) if c not in group_by], key="large_csv_values")
+        if group_by:
+            options.update(mode="aggregate", group_by=group_by, value_columns=value_columns)
+    return options
+
+# Sidebar options for uploaded workbooks: pick a sheet, columns and a row window before parsing.
+# Sheet names and headers come from the workbook metadata, so no cell data is read here.
+def fast_excel_options(uploaded_file):
+    if uploaded_file is None or not uploaded_file.name.endswith('.xlsx'):
+        return None
+    if not st.sidebar.checkbox("Fast Excel mode (selected sheet, columns and rows)", key="fast_excel_mode"):
+        return None
+
+    sheets = {sheet["name"]: sheet for sheet in excel_sheets(uploaded_file)}
+    sheet = st.sidebar.selectbox("Sheet", list(sheets), key="fast_excel_sheet",
+                                 format_func=lambda name: f"{name} ({max(sheets[name]['rows'] or 1, 1) - 1:,} rows)")
+    columns = sheets[sheet]["columns"]
+    usecols = st.sidebar.multiselect("Columns to load", columns, default=columns, key="fast_excel_columns")
+    skip_rows = st.sidebar.number_input("First data row", min_value=1, value=1, step=1, key="fast_excel_start") - 1
+    nrows = st.sidebar.number_input("Rows to load (0 loads all)", min_value=0, value=0, step=1000, key="fast_excel_rows")
+    engines = EXCEL_ENGINES if calamine_available() else [e for e in EXCEL_ENGINES if e != "calamine"]
+    engine = st.sidebar.selectbox("Excel engine", engines, key="fast_excel_engine",
+                                  help="auto uses calamine when python-calamine is installed, otherwise openpyxl in read-only mode")
+    return {"sheet": sheet, "usecols": usecols or None, "skip_rows": int(skip_rows), "nrows": int(nrows) or None, "engine": engine}
+
+# Sidebar filters and group-by for the plotted rows. Returns (filters, group_by, aggregation);
+# filters are ("range", column, low, high) or ("in", column, values) tuples for filtering.apply_filters.
+def sidebar_filters(df, dataset_key):
+    index = dataset_index(df, dataset_key)
+    st.sidebar.header("Filter and group")
+    filterable = [c for c in df.columns if index.kind(c) is not None]
+    filters = []
+    for column in st.sidebar.multiselect("Filter by", filterable, key="filter_columns"):
+        if index.kind(column) == "categorical":
+            categories = index.categories(column)
+            selected = st.sidebar.multiselect(f"{column}", categories, default=categories, key=f"filter_in_{column}")
+            if len(selected) < len(categories):
+                filters.append(("in", str(column), tuple(selected)))
+            continue
+        bounds = index.bounds(column)
+        if bounds is None or bounds[0] == bounds[1]:
+            continue
+        low, high = bounds
+        if isinstance(low, pd.Timestamp):
+            window = st.sidebar.date_input(f"{column}", value=(low.date(), high.date()), min_value=low.date(), max_value=high.date(), key=f"filter_dates_{column}")
+            if len(window) == 2 and (window[0] > low.date() or window[1] < high.date()):
+                end = pd.Timestamp(window[1]) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+                filters.append(("range", str(column), pd.Timestamp(window[0]), end))
+            continue
+        if pd.api.types.is_integer_dtype(df[column]):
+            low, high = int(low), int(high)
+        else:
+            low, high = float(low), float(high)
+        chosen = st.sidebar.slider(f"{column}", min_value=low, max_value=high, value=(low, high), key=f"filter_range_{column}")
+        if chosen != (low, high):
+            filters.append(("range", str(column), *chosen))
+
+    group_by = st.sidebar.multiselect("Group by", [c for c in filterable if index.kind(c) == "categorical"], key="group_by_columns")
+    aggregation = st.sidebar.selectbox("Aggregate values with", AGGREGATIONS, key="group_by_aggregation") if group_by else None
+    return filters, group_by, aggregation
+
+# Figure of the current view; encode=True compacts its payload (see figure_encoding.py) before it's
+# cached and sent, recording the serialized size before and after
+def build_figure(view, params, max_points, geo_options, encode):
+    fig = generate_plot(view, *params, max_points=max_points, **geo_options)
+    if fig is None or not encode:
+        return fig
+    with span("encode_figure") as encode_span:
+        fig, report = encode_figure(fig)
+        encode_span["raw_payload_bytes"] = report["before_bytes"]
+        encode_span["payload_bytes"] = report["after_bytes"]
     return fig
 
+# Optional sidebar panel with this rerun's stage timings and exports for dashboards
+def render_diagnostics(run):
+    st.sidebar.subheader("Diagnostics")
+    if not run.spans:
+        st.sidebar.caption("No stages recorded in this run.")
+        return
+    spans = pd.DataFrame(run.spans).sort_values("start")  # nested spans finish (and are recorded) before their parent
+    columns = ["name", "seconds"] + [c for c in spans.columns if c not in ("name", "seconds", "start")]
+    st.sidebar.dataframe(spans[columns], hide_index=True)
+    st.sidebar.download_button("Export run (JSON lines)", run.to_jsonl(), file_name="visbot_run.jsonl", mime="application/x-ndjson")
+    dispatch = openai_dispatcher.stats()
+    st.sidebar.caption(
+        f"AI requests: {dispatch['active']} running, {dispatch['waiting']} queued, {dispatch['calls']} sent, "
+        f"{dispatch['coalesced']} shared, {dispatch['retries']} retried, {dispatch['failures']} failed"
+        + (f"; call p95 {dispatch['call_p95']:.1f}s, queue p95 {dispatch['queue_p95']:.1f}s" if dispatch["call_p95"] is not None else "")
+    )
+    st.sidebar.download_button("Export totals (Prometheus)", to_prometheus() + openai_dispatcher.to_prometheus(), file_name="visbot_metrics.prom", mime="text/plain")
+
 # Main function to run the Streamlit app
 def main():
+    # Every stage of this rerun is timed; the diagnostics panel shows the spans
+    run = start_run()
+    show_diagnostics = st.sidebar.checkbox("Diagnostics panel", key="diagnostics_panel", help="Stage timings, memory and payload sizes of this rerun")
+
     # User interface with Streamlit
     st.title("VisBot - TEST - Visualization Recommender with AI")
     
-    # Input for OpenAI API key
-    api_key = openai.api_key
-    
     # Input for URL
     url_input = st.text_input("Enter the URL of the data file")
     
     # Input to upload a local file
-    uploaded_file = st.file_uploader("Load your CSV, XLSX or JSON file", type=["csv", "xlsx", "json"])
+    uploaded_file = st.file_uploader("Load your CSV, XLSX or JSON file", type=["csv", "xlsx", "json", "ndjson", "jsonl"])
     
     df = None
 
+    use_columnar = False
+    if url_input or uploaded_file is not None:
+        st.sidebar.header("Loading")
+        if columnar_store.available():
+            use_columnar = st.sidebar.checkbox("Columnar store (memory-mapped reopen)", key="columnar_store", help="Keep an Arrow copy of parsed datasets so reopening them skips parsing")
+        compact = st.sidebar.checkbox("Compact column types", value=COMPACT_BY_DEFAULT, key="compact_dtypes",
+                                      help="Store repetitive text as categories, parse ISO dates and use the smallest lossless numeric types")
+    else:
+        compact = False
+    csv_options = large_csv_options(url_input, uploaded_file)
+    excel_options = None if url_input else fast_excel_options(uploaded_file)
+    read_variant = (csv_options, excel_options, compact) if (csv_options or excel_options or compact) else None
+    progress_bar = st.progress(0.0, text="Loading data...") if csv_options else None
+
+    def report_progress(rows_read, fraction):
+        if progress_bar is not None:
+            progress_bar.progress(fraction or 0.0, text=f"Loaded {rows_read:,} rows...")
+
     # Leer el archivo o URL
-    
-    if url_input:
-        try:
-            df = read_data(url_input)
-        except ValueError as e:
-            st.error(f"Error when processing data from URL: {e}")
-    elif uploaded_file is not None:
-        try:
-            df = read_data(uploaded_file)
-        except ValueError as e:
-            st.error(f"Error processing file: {e}")
+    hits_before, misses_before = dataset_cache.hits, dataset_cache.misses
+    with span("load") as load_span:
+        if url_input:
+            try:
+                df = cached_read(url_input, lambda source: read_data(source, csv_options, report_progress, use_columnar, excel_options, compact), variant=read_variant, columnar=use_columnar)
+            except ValueError as e:
+                st.error(f"Error when processing data from URL: {e}")
+        elif uploaded_file is not None:
+            try:
+                df = cached_read(uploaded_file, lambda source: read_data(source, csv_options, report_progress, use_columnar, excel_options, compact), variant=read_variant, columnar=use_columnar)
+            except ValueError as e:
+                st.error(f"Error processing file: {e}")
+        load_span["cache_hits"] = dataset_cache.hits - hits_before
+        load_span["cache_misses"] = dataset_cache.misses - misses_before
+        if df is not None:
+            load_span["rows"] = len(df)
+            if show_diagnostics:
+                load_span["frame_bytes"] = frame_bytes(df)
+
+    if progress_bar is not None:
+        progress_bar.empty()
+
+    # Sessions working on the same data share one frame from the process-wide store
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    if df is not None:
+        dataset_key = dataset_fingerprint(df)
+        df = shared_store.acquire(session_id, df, dataset_key)
+    else:
+        shared_store.release(session_id)
 
     if df is not None:
+        cache_stats = dataset_cache.stats()
+        st.sidebar.caption(f"Dataset cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['bytes'] / 1e6:.1f} MB")
+        figure_stats = figure_cache.stats()
+        st.sidebar.caption(f"Figure cache: {figure_stats['hits']} hits, {figure_stats['misses']} misses, {figure_stats['evictions']} evictions, {figure_stats['bytes'] / 1e6:.1f} MB")
+        store_stats = shared_store.stats()
+        st.sidebar.caption(
+            f"Shared datasets: {store_stats['entries']} ({store_stats['referenced_entries']} in use by {store_stats['sessions']} sessions), "
+            f"{store_stats['total_bytes'] / 1e6:.1f} of {store_stats['max_bytes'] / 1e6:.0f} MB including the dataset cache"
+        )
+        if df.attrs.get("sampled"):
+            st.info(f"Showing a uniform sample of {len(df):,} of {df.attrs['source_rows']:,} rows to stay under the memory ceiling.")
+        elif df.attrs.get("aggregated"):
+            st.info(f"Showing {len(df):,} groups pre-aggregated from {df.attrs['source_rows']:,} rows.")
+        compaction = df.attrs.get("compaction")
+        if compaction and compaction["columns"]:
+            st.sidebar.caption(
+                f"Compacted {len(compaction['columns'])} columns: {compaction['before_bytes'] / 1e6:.1f} MB -> {compaction['after_bytes'] / 1e6:.1f} MB",
+                help="\n".join(f"- {column}: {change}" for column, change in compaction["columns"].items()),
+            )
         st.write(df.head())  # Mostrar las primeras filas del DataFrame
 
-        # Generar y mostrar las recomendaciones de visualización de OpenAI
+        # Generar y mostrar las recomendaciones de visualización de OpenAI.
+        # The request streams on a background thread; the chart below renders without waiting for it.
         st.subheader("iA Recommended Visualizations")
+        recommendation_placeholder = st.empty()
+        recommendation = None
         try:
-            recommendation = get_openai_recommendation(df)
-            st.markdown(recommendation)  # Muestra las recomendaciones de GPT-4
+            refresh = st.sidebar.button("Refresh AI recommendation", help="Ask the model again instead of reusing the cached answer")
+            with span("recommendation_start"):
+                recommendation = start_openai_recommendation(df, refresh=refresh)
+            if isinstance(recommendation, str):
+                recommendation_placeholder.markdown(recommendation)  # Muestra las recomendaciones de GPT-4
+            else:
+                recommendation_placeholder.info("Generating AI recommendations...")
         except Exception as e:
-            st.error(f"Error getting OpenAI recommendations: {str(e)}")
+            recommendation_placeholder.error(f"Error getting OpenAI recommendations: {str(e)}")
+
+        # Filters and group-by slice the plotted rows through indexes built once per dataset
+        filters, group_by, aggregation = sidebar_filters(df, dataset_key)
+        with span("filter", filters=len(filters)) as filter_span:
+            view = apply_filters(df, filters, dataset_key)
+            if group_by:
+                view = group_aggregate(view, group_by, aggregation)
+            filter_span["rows"] = len(view)
+        if filters or group_by:
+            st.caption(f"Plotting {len(view):,} {'groups' if group_by else 'rows'} of {len(df):,} rows.")
 
         # Selección de tipo de gráfico (chart_type) y variables para los ejes
-        chart_type = st.sidebar.selectbox(
-            "Select chart type",
-            [
-                "Scatter Plot", "Bar Chart", "Stacked Bar Chart", 
-                "Histogram","Line Chart", "Area Chart",  "Boxplot", "Pie chart",
-                "3D Scatter Plot",  "Violin plot", "Heat map",
-                "Geospatial scatter map", "Choropleth map", "Sun diagram"
-            ]
-        )
+        chart_type = st.sidebar.selectbox("Select chart type", CHART_TYPES)
 
-        x_axis = st.sidebar.selectbox("Select the column for the X axis", df.columns)
-        y_axis = st.sidebar.selectbox("Select the column for the Y axis", df.columns)
+        x_axis = st.sidebar.selectbox("Select the column for the X axis", view.columns)
+        y_axis = st.sidebar.selectbox("Select the column for the Y axis", view.columns)
 
         z_axis = None
         if chart_type in ["3D Scatter Plot", "Stacked Bar Chart", "Grouped Bar Chart"]:
-            z_axis = st.sidebar.selectbox("Select column for Z axis (optional)", df.columns)
+            z_axis = st.sidebar.selectbox("Select column for Z axis (optional)", view.columns)
 
         hist_bins = st.sidebar.slider("Number of bins for histograms", min_value=10, max_value=100, value=20, key="hist_bins_slider")
         scatter_size = st.sidebar.slider("Size of points on scatter plot", min_value=5, max_value=50, value=10, key="scatter_size_slider")
 
-        # Generate the selected chart
-        fig = generate_plot(df, chart_type, x_axis, y_axis, z_axis, hist_bins, scatter_size)
+        # Large point maps are drawn as grid-cell counts; the resolution can be picked per zoom level.
+        # Choropleths combine the rows sharing a location, averaging by default.
+        geo_options = {}
+        if chart_type == "Geospatial scatter map":
+            levels = [None] + list(range(len(LEVEL_DEGREES)))
+            geo_options["geo_level"] = st.sidebar.selectbox("Map resolution", levels, key="geo_level",
+                                                            format_func=lambda level: "Auto" if level is None else f"Level {level} ({LEVEL_DEGREES[level]:g}° cells)")
+            geo_options["geo_grid"] = st.sidebar.radio("Map grid", GRIDS, horizontal=True, key="geo_grid")
+        elif chart_type == "Choropleth map":
+            geo_options["location_aggregation"] = st.sidebar.selectbox("Combine values per location with", AGGREGATIONS, index=AGGREGATIONS.index("mean"),
+                                                                       key="location_aggregation", help="Numeric values of rows sharing a location; text keeps the most frequent value")
+
+        encode = st.sidebar.checkbox("Compact figure payloads", value=ENCODE_BY_DEFAULT, key="encode_figures",
+                                     help="Send numbers as binary float32/integer arrays and repeated axis labels as codes with tick labels")
+
+        # Generate the selected chart. Large point-based charts show a quick preview at a small
+        # point budget first, then are replaced by the refined figure.
+        # Figures are memoized per dataset fingerprint and chart parameters, so flipping back to a
+        # chart that was already drawn skips building it again. Other sessions may be drawing the
+        # same dataset, so figures of a dataset this session left are only dropped by the LRU.
+        params = (chart_type, x_axis, y_axis, z_axis, hist_bins, scatter_size)
+        view_params = params + ((tuple(filters), tuple(group_by), aggregation), tuple(sorted(geo_options.items())), encode)
+        chart_placeholder = st.empty()
+        if chart_type in POINT_CHART_TYPES and len(view) > PREVIEW_POINTS and not figure_cache.has_figure(dataset_key, view_params + (FULL_POINTS,)):
+            preview = cached_figure(dataset_key, view_params + (PREVIEW_POINTS,), lambda: build_figure(view, params, PREVIEW_POINTS, geo_options, encode))
+            if preview:
+                with span("plotly_chart", figure="preview"):
+                    chart_placeholder.plotly_chart(preview)
+        fig = cached_figure(dataset_key, view_params + (FULL_POINTS,), lambda: build_figure(view, params, FULL_POINTS, geo_options, encode))
 
         # Show the chart in the interface
         if fig:
-            st.plotly_chart(fig)
+            with span("plotly_chart") as chart_span:
+                if show_diagnostics:
+                    chart_span["payload_bytes"] = len(fig.to_json())
+                chart_placeholder.plotly_chart(fig)
         
         else:
-            st.warning("Please select a chart type and valid columns.")
+            chart_placeholder.warning("Please select a chart type and valid columns.")
+
+        # The panel goes up before the AI wait below, which can block until the job's deadline
+        if show_diagnostics:
+            render_diagnostics(run)
+
+        # Stream the AI answer into its section now that the chart is on screen
+        if recommendation is not None:
+            with span("recommendation_wait"):
+                render_recommendation(recommendation_placeholder, recommendation)
+
+    elif show_diagnostics:
+        render_diagnostics(run)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file